@@ -0,0 +1,56 @@
+import numpy as np
+
+def refine(x, y, tolerance : float, min_step : float = 0, budget : int = None) -> np.ndarray:
+    """ New sample positions for a measured curve y(x), the midpoints of the intervals where
+        the curve changes by more than tolerance of its range across the interval (gradient)
+        or bends away from the straight line through its neighbours (curvature).
+        Intervals narrower than 2 * min_step are kept, at most budget midpoints are returned,
+        the steepest first, in ascending order """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+    if len(x) < 2 or budget == 0:
+        return np.empty(0)
+    scale = np.ptp(y)
+    if not np.isfinite(scale) or scale == 0:
+        return np.empty(0)
+    dx = np.diff(x)
+    score = np.abs(np.diff(y)) / scale
+    if len(x) > 2:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            line = y[:-2] + (y[2:] - y[:-2]) * (x[1:-1] - x[:-2]) / (x[2:] - x[:-2])
+        curvature = np.nan_to_num(np.abs(y[1:-1] - line) / scale)
+        score[:-1] = np.maximum(score[:-1], curvature)
+        score[1:] = np.maximum(score[1:], curvature)
+    candidates = np.flatnonzero((score > tolerance) & (dx > 0) & (dx / 2 >= min_step))
+    candidates = candidates[np.argsort(-score[candidates], kind="stable")][:budget]
+    return np.sort(x[candidates] + dx[candidates] / 2)
+
+class OffsetPass():
+    """ One pass over the offset axis at a fixed (heater voltage, frequency, amplitude) key.
+        points are the plan points still to measure, offsets and values every offset of the
+        pass measured so far, by this run or the one it resumes, with its adaptive column
+        value. Refined points are numbered from first_refined on, one number per refinement """
+    def __init__(self, number : int, key : tuple, points : np.ndarray, first_refined : int):
+        self.number = number
+        self.key = key
+        self.points = points
+        self.first_refined = first_refined
+        self.offsets = []
+        self.values = []
+        self.refined = 0
+
+    @property
+    def heater_voltage(self) -> float:
+        return self.key[0]
+
+    @property
+    def next_refined_index(self) -> int:
+        return self.first_refined + self.refined
+
+    def add(self, offset : float, value : float, refined : bool = False):
+        self.offsets.append(float(offset))
+        self.values.append(float(value))
+        if refined:
+            self.refined += 1
@@ -0,0 +1,33 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from GMOS_LIA.LabDevices import Instrument
+
+_executor = None
+
+def get_executor(max_workers : int = 8) -> ThreadPoolExecutor:
+    """ Process wide executor of the blocking instrument I/O, bounded by max_workers when created """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers, thread_name_prefix="async-instrument-io")
+    return _executor
+
+async def run_blocking(func, *args, **kwargs):
+    """ Await a blocking call on the instrument executor """
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+class AsyncInstrument():
+    """ Awaitable view of an Instrument, every method call runs on the instrument executor.
+        Awaited one after the other the calls keep their order, calls on different
+        instruments overlap and the event loop is free while they wait on the bus """
+    def __init__(self, device : Instrument):
+        self.device = device
+
+    def __getattr__(self, name):
+        attribute = getattr(self.device, name)
+        if not callable(attribute):
+            return attribute
+        async def method(*args, **kwargs):
+            return await run_blocking(attribute, *args, **kwargs)
+        method.__name__ = name
+        return method
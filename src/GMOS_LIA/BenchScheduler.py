@@ -0,0 +1,125 @@
+import os
+import time
+import queue
+import traceback
+import multiprocessing
+from GMOS_LIA.LIASetup import BaseSetup, testers
+
+class BenchStatus():
+    """ Progress of the tester running on one bench """
+    __slots__ = ("name", "status", "rows", "result_file", "error", "started", "finished")
+
+    def __init__(self, name : str):
+        self.name = name
+        self.status = "pending"
+        self.rows = 0
+        self.result_file = None
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def duration(self) -> float:
+        if self.started is None:
+            return 0
+        return (self.finished or time.monotonic()) - self.started
+
+    def __repr__(self):
+        return f"{self.name}: {self.status}, {self.rows} rows in {self.duration:.1f} s"
+
+def _run_bench(bench : dict, visa_library : str, results_root : str, messages, initializer = None):
+    """ Worker process of one bench, reports to the scheduler through messages """
+    name = bench["name"]
+    res_man = None
+    try:
+        if initializer is not None:
+            initializer()
+        from pyvisa import ResourceManager
+        res_man = ResourceManager(visa_library)
+        messages.put(("running", name, None))
+        with testers[bench["tester"]](res_man, bench["devices"], results_root) as tester:
+            tester.add_result_listener(lambda measurment: messages.put(("row", name, None)))
+            tester.perform_measurements(**bench.get("parameters", {}))
+            messages.put(("done", name, tester.result_file))
+    except BaseException:
+        messages.put(("failed", name, traceback.format_exc()))
+    finally:
+        if res_man is not None:
+            res_man.close()
+
+class BenchScheduler():
+    """ Runs one tester per bench, each in its own process with its own instruments, so a
+        failing bench never takes the others down. The results of every bench go to
+        their own directory under results_root/<bench name>.
+        benches are dicts with "name", "devices" (a setup.json device section), "tester" and
+        optional "parameters" for perform_measurements. initializer is run first in every
+        worker, e.g. to register mock resources """
+    def __init__(self, benches : list, visa_library : str = "", results_root : str = None, initializer = None):
+        names = [bench["name"] for bench in benches]
+        if len(set(names)) != len(names):
+            raise Exception(f"Bench names are not unique: {names}")
+        for bench in benches:
+            if bench["tester"] not in testers:
+                raise Exception(f"Unsupported tester {bench['tester']} on bench {bench['name']}")
+        self._benches = benches
+        self._visa_library = visa_library
+        self._results_root = results_root or BaseSetup._measurement_results_dir
+        self._initializer = initializer
+        self.statuses = {name: BenchStatus(name) for name in names}
+
+    @classmethod
+    def from_setup(cls, setup : dict, **kwargs):
+        return cls(setup["benches"], **kwargs)
+
+    def bench_results_dir(self, name : str) -> str:
+        return os.path.join(self._results_root, name)
+
+    def run(self, progress = None, poll_interval : float = 0.5) -> dict:
+        """ Run all benches to completion, progress(status) is called on every status change.
+            Returns the BenchStatus of every bench by name """
+        context = multiprocessing.get_context("spawn")
+        messages = context.Queue()
+        processes = {}
+        for bench in self._benches:
+            process = context.Process(
+                        target=_run_bench,
+                        args=(bench, self._visa_library, self.bench_results_dir(bench["name"]), messages, self._initializer),
+                        name=f"bench-{bench['name']}")
+            process.start()
+            processes[bench["name"]] = process
+            self.statuses[bench["name"]].started = time.monotonic()
+        while any(status.finished is None for status in self.statuses.values()):
+            try:
+                kind, name, detail = messages.get(timeout=poll_interval)
+            except queue.Empty:
+                for name, process in processes.items():
+                    status = self.statuses[name]
+                    if status.finished is None and not process.is_alive() and messages.empty():
+                        self._update(status, "failed", f"worker exited with code {process.exitcode}", progress)
+                continue
+            status = self.statuses[name]
+            if kind == "row":
+                status.rows += 1
+            else:
+                self._update(status, kind, detail, progress)
+        for process in processes.values():
+            process.join()
+        return self.statuses
+
+    @staticmethod
+    def _update(status : BenchStatus, kind : str, detail, progress):
+        status.status = kind
+        if kind == "done":
+            status.result_file = detail
+        elif kind == "failed":
+            status.error = detail
+        if kind in ("done", "failed"):
+            status.finished = time.monotonic()
+        if progress is not None:
+            progress(status)
+
+    def summary(self) -> str:
+        failed = [status for status in self.statuses.values() if status.status == "failed"]
+        lines = [repr(status) for status in self.statuses.values()]
+        lines.append(f"{len(self.statuses) - len(failed)} of {len(self.statuses)} benches completed")
+        return "\n".join(lines)
@@ -0,0 +1,163 @@
+import sys
+import time
+import json
+import platform
+import tempfile
+import threading
+import tracemalloc
+import numpy as np
+from GMOS_LIA.LIASetup import IVTester, ThreeTTester, load_setup_config
+from GMOS_LIA.LabDevices import instrument_pool
+from GMOS_LIA.Simulation import SimulatedResourceManager
+
+default_sizes = (10, 50, 200)
+default_simulation = {
+    "latency"             : 1e-3,
+    "byte time"           : 1e-6,
+    "heater time constant": 20e-3,
+    "noise"               : 1e-4}
+
+class SleepMeter():
+    """ Accounts the time.sleep calls of the calling thread while active, instrument I/O
+        sleeps inside the simulator are not seen since it keeps its own reference """
+    def __init__(self):
+        self.total = 0.0
+        self._sleep = None
+        self._thread = None
+
+    def __enter__(self):
+        self._sleep = time.sleep
+        self._thread = threading.get_ident()
+        def sleep(seconds):
+            start = time.monotonic()
+            self._sleep(seconds)
+            if threading.get_ident() == self._thread:
+                self.total += time.monotonic() - start
+        time.sleep = sleep
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        time.sleep = self._sleep
+
+def sweep_parameters(tester_name : str, points : int) -> dict:
+    """ Sweep axis giving points points to the tester, on the part of the curve the simulated sensor responds """
+    if tester_name == "IVTester":
+        return {"smu_voltage": [0, 5, 5 / points]}
+    return {"lia_offset": [0.8, 1.1, 0.3 / points], "heater_voltage": 3}
+
+def run_sweep(tester_class, setup : dict, points : int, simulation : dict, results_root : str,
+              sleep_time : float, heater_sleep : float, parallel_io : bool, seed : int = 0) -> dict:
+    """ One sweep on a fresh simulated bench, returns its throughput figures """
+    setup = dict(setup, **{"parallel io": parallel_io, "live plot": False})
+    res_man = SimulatedResourceManager.from_setup(setup, settings=simulation, seed=seed)
+    instrument_pool.release()
+    rows = []
+    with tester_class(res_man, results_root=results_root) as tester:
+        tester._sleep_time = sleep_time
+        tester._heater_sleep = heater_sleep
+        tester.add_result_listener(rows.append)
+        res_man.reset_statistics()
+        with SleepMeter() as sleeps:
+            start = time.perf_counter()
+            tester.perform_measurements(**sweep_parameters(tester_class.__name__, points))
+            wall = time.perf_counter() - start
+    instrument_pool.release()
+    n_rows = max(len(rows), 1)
+    return {
+        "tester"                 : tester_class.__name__,
+        "points"                 : points,
+        "rows"                   : len(rows),
+        "wall time"              : wall,
+        "points per second"      : len(rows) / wall,
+        "transactions"           : res_man.transactions,
+        "transactions per point" : res_man.transactions / n_rows,
+        "bytes per point"        : res_man.bytes / n_rows,
+        "io time"                : res_man.io_time,
+        "sleep time"             : sleeps.total,
+        "python time"            : max(wall - res_man.io_time - sleeps.total, 0.0)}
+
+def peak_memory(tester_class, setup : dict, points : int, *args, **kwargs) -> int:
+    """ Peak traced allocation of a second run, kept apart so tracing does not slow the timed one """
+    tracemalloc.start()
+    try:
+        run_sweep(tester_class, setup, points, *args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_benchmarks(sizes = default_sizes, testers = (IVTester, ThreeTTester), simulation : dict = None,
+                   sleep_time : float = 5e-3, heater_sleep : float = 0.1, parallel_io : bool = False,
+                   memory : bool = True, setup : dict = None) -> dict:
+    """ Run every tester at every sweep size on the simulated bench and collect the report.
+        With parallel io the io time is the busy time summed over the I/O threads and may
+        exceed the share of the wall time it overlaps """
+    simulation = dict(default_simulation, **(simulation or {}))
+    setup = setup or load_setup_config("setup.json")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="gmos-benchmark-") as results_root:
+        for tester_class in testers:
+            for points in sizes:
+                arguments = (simulation, results_root, sleep_time, heater_sleep, parallel_io)
+                result = run_sweep(tester_class, setup, points, *arguments)
+                result["peak memory"] = peak_memory(tester_class, setup, points, *arguments) if memory else None
+                print(f"[Benchmark] {result['tester']} {points} points: {result['points per second']:.1f} points/s, "
+                      f"{result['transactions per point']:.1f} transactions/point, "
+                      f"io {result['io time']:.3f} s, sleep {result['sleep time']:.3f} s, python {result['python time']:.3f} s")
+                results.append(result)
+    return {
+        "created"     : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python"      : platform.python_version(),
+        "numpy"       : np.__version__,
+        "platform"    : platform.platform(),
+        "simulation"  : simulation,
+        "sleep time"  : sleep_time,
+        "heater sleep": heater_sleep,
+        "parallel io" : parallel_io,
+        "results"     : results}
+
+def compare_reports(report : dict, baseline : dict, tolerance : float = 0.2) -> list:
+    """ Descriptions of the runs whose throughput dropped or bus traffic grew by more than tolerance """
+    previous = {(result["tester"], result["points"]): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["tester"], result["points"]))
+        if before is None:
+            continue
+        name = f"{result['tester']} {result['points']} points"
+        if result["points per second"] < (1 - tolerance) * before["points per second"]:
+            regressions.append(f"{name}: {result['points per second']:.1f} points/s, was {before['points per second']:.1f}")
+        if result["transactions per point"] > (1 + tolerance) * before["transactions per point"]:
+            regressions.append(f"{name}: {result['transactions per point']:.1f} transactions/point, was {before['transactions per point']:.1f}")
+    return regressions
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Sweep throughput on the simulated GMOS bench")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(default_sizes), help="sweep sizes in points")
+    parser.add_argument("--testers", nargs="+", default=["IVTester", "ThreeTTester"], choices=["IVTester", "ThreeTTester"])
+    parser.add_argument("--latency", type=float, default=default_simulation["latency"], help="bus latency per transaction [s]")
+    parser.add_argument("--sleep", type=float, default=5e-3, help="settle timeout of a point [s]")
+    parser.add_argument("--heater-sleep", type=float, default=0.1, help="settle timeout of the heater [s]")
+    parser.add_argument("--parallel-io", action="store_true", help="talk to the instruments concurrently")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak memory runs")
+    parser.add_argument("--output", default="benchmark_report.json", help="JSON report file")
+    parser.add_argument("--baseline", help="report to compare against, exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    testers = {"IVTester": IVTester, "ThreeTTester": ThreeTTester}
+    report = run_benchmarks(args.sizes, [testers[name] for name in args.testers], {"latency": args.latency},
+                            args.sleep, args.heater_sleep, args.parallel_io, not args.no_memory)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=4)
+    print(f"[Benchmark] report written to {args.output}")
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = compare_reports(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"[Benchmark] regression {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+class CheckpointJournal():
+    """ Append only JSON lines journal kept next to a result file. It holds the sweep plan
+        hash, the indices of the points whose rows reached the result file in row order, the
+        number of rows committed with them, the acquired operation points and the adaptive
+        passes whose refinement finished """
+    extension = ".ckpt"
+
+    def __init__(self, result_file : str, plan_hash : str):
+        self._filename = f"{result_file}{self.extension}"
+        self._plan_hash = plan_hash
+        self._pending = []
+        self.completed = set()
+        self.points = []
+        self.operation_points = {}
+        self.refined = set()
+        self.rows = 0
+        self.done = False
+        self._file = None
+
+    @staticmethod
+    def plan_hash(*parts) -> str:
+        """ Digest of the sweep definition, arrays are hashed by their raw bytes """
+        digest = hashlib.sha1()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                digest.update(np.ascontiguousarray(part).tobytes())
+            else:
+                digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def find_resumable(cls, results_dirs : list, result_name : str, plan_hash : str):
+        """ Newest journal of an unfinished run of the same plan among results_dirs """
+        for results_dir in sorted(results_dirs, reverse=True):
+            journal = cls(os.path.join(results_dir, result_name), plan_hash)
+            if journal.load() and not journal.done:
+                return journal
+        return None
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    def load(self) -> bool:
+        """ Read an existing journal, returns False when it is missing or of another plan """
+        try:
+            with open(self._filename, 'r') as file:
+                entries = [json.loads(line) for line in file if line.strip()]
+        except (OSError, ValueError):
+            return False
+        if not entries or entries[0].get("plan") != self._plan_hash:
+            return False
+        for entry in entries[1:]:
+            self.points.extend(entry.get("points", ()))
+            self.rows = entry.get("rows", self.rows)
+            self.operation_points.update(entry.get("operation points", {}))
+            if "refined" in entry:
+                self.refined.add(entry["refined"])
+            self.done = entry.get("done", self.done)
+        self.completed.update(self.points)
+        return True
+
+    def open(self, resume : bool = False):
+        exists = resume and os.path.exists(self._filename)
+        self._file = open(self._filename, 'a' if exists else 'w')
+        if not exists:
+            self._append({"plan": self._plan_hash})
+        return self
+
+    def _append(self, entry : dict):
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def mark(self, index : int):
+        """ Point index whose row was handed to the result sink but may not be on disk yet """
+        self._pending.append(int(index))
+
+    def commit(self, rows : int):
+        """ The result file holds rows rows, all marked points are safe """
+        if self._pending:
+            self._append({"points": self._pending, "rows": rows})
+            self.completed.update(self._pending)
+            self.points.extend(self._pending)
+            self._pending = []
+        self.rows = rows
+
+    def set_operation_point(self, key : str, current : float):
+        self.operation_points[key] = current
+        self._append({"operation points": {key: current}})
+
+    def set_refined(self, number : int):
+        """ The adaptive refinement of offset pass number is finished """
+        self.refined.add(number)
+        self._append({"refined": number})
+
+    def finish(self):
+        self._append({"done": True})
+        self.done = True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
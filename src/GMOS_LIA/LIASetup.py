@@ -1,20 +1,57 @@
 import os
-import csv
+import copy
 import json
 import time
-from itertools import product
-from functools import wraps
+import asyncio
+import inspect
+from functools import wraps, partial
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 import numpy as np
-from pyvisa import ResourceManager
 from GMOS_LIA.LabDevices import *
 from GMOS_LIA.ResultPlotter import Plotter
+from GMOS_LIA.ResultSinks import open_result_sink, truncate_results, load_results, RotatingResultSink
+from GMOS_LIA.Settling import Settler
+from GMOS_LIA.ParallelIO import ParallelIO
+from GMOS_LIA.SweepPlan import SweepPlan
+from GMOS_LIA.OperatingPoint import find_operating_point
+from GMOS_LIA.Checkpoint import CheckpointJournal
+from GMOS_LIA.AdaptiveSweep import refine, OffsetPass
+from GMOS_LIA.StreamingStats import Averager
+from GMOS_LIA.Monitor import RingBuffer, TimingMonitor, ticks
+from GMOS_LIA.AsyncDevices import AsyncInstrument, run_blocking, get_executor
+from GMOS_LIA.Tracing import tracer, format_summary
+from GMOS_LIA.SoftwareLockIn import SoftwareLockIn
+from GMOS_LIA.ResultCatalogue import ResultCatalogue
+from GMOS_LIA.Records import MeasurementRecords
+if TYPE_CHECKING:
+    from pyvisa import ResourceManager
+
+_setup_configs = {}
+
+def load_setup_config(path="setup.json") -> dict:
+    """ Parsed setup file, read again only when it changed on disk """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _setup_configs.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'r') as file:
+            cached = _setup_configs[path] = (mtime, json.load(file))
+    return copy.deepcopy(cached[1])
 
 class BaseSetup():
     _project_dir = os.path.join(os.getcwd(), "..")
     _measurement_results_dir = os.path.join(_project_dir, "measuremet_results")
     
-    def __init__(self, res_man:ResourceManager):
+    def __init__(self, res_man:"ResourceManager", connected_devices: str = None, results_root: str = None):
+        """ connected_devices names the setup.json section of device addresses to use
+            instead of the one selected by "connected devices", results_root replaces the
+            measurement results directory e.g. to keep the results of one bench apart """
         self._res_man = res_man
+        self._connected_devices = connected_devices
+        if results_root is not None:
+            self._measurement_results_dir = results_root
+        self._result_listeners = []
         tester_name = self.__class__.__name__
         self._start_time = timestr = time.strftime("%Y%m%d-%H%M%S")
         self._results_dir = os.path.join(
@@ -22,11 +59,12 @@ class BaseSetup():
                         tester_name,
                         self._start_time)
         self._result_file = None
+        self._result_sink = None
+        self._checkpoint = None
+        self._records = None
+        self.trace_summary = None
         self._devices = {}
-        #load_setup_config(path="setup.json")
-        with open("setup.json", 'r') as file:
-            setup = json.load(file)
-            self.initialize_tester_info(setup)
+        self.initialize_tester_info(load_setup_config("setup.json"))
     
     @classmethod
     def genResultFileName(cls, filename: str = None):
@@ -44,37 +82,176 @@ class BaseSetup():
     
     @staticmethod
     def setup_fixture(func):
+        """ Wrap a sweep, plain or async, in its result file, checkpoint and live plot.
+            The wrapped sweep returns all its rows as a structured array """
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.sweep_context(kwargs):
+                    await func(self, *args, **kwargs)
+                return self.results
+            return async_wrapper
+
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            self.update_sweep_parameters(kwargs)
+            with self.sweep_context(kwargs):
+                func(self, *args, **kwargs)
+            return self.results
+        return wrapper
+
+    @contextmanager
+    def sweep_context(self, kwargs):
+        self.update_sweep_parameters(kwargs)
+        resumed = self.prepare_checkpoint(
+            filename=kwargs.get("filename"),
+            abspath=kwargs.get("abspath", False),
+            resume=kwargs.get("resume", False))
+        self._records = MeasurementRecords(self.result_columns(), self.expected_points())
+        if resumed and self._checkpoint.rows:
+            self._records.extend(load_results(self._result_file)[0])
+        completed = False
+        sweep_start = time.monotonic()
+        try:
             with self.prepare_result_file(
                 filename=kwargs.get("filename"),
-                abspath=kwargs.get("abspath", False)
-            ) as file:
-                self._csv_writer = csv.writer(file)
-                return func(self, *args, **kwargs)
-        return wrapper
+                abspath=kwargs.get("abspath", False),
+                append=resumed
+            ) as sink, tracer.tracing(self._trace_settings.get("enabled", False), self._trace_settings.get("capacity")):
+                sink.rows = self._checkpoint.rows
+                self._result_sink = sink
+                self._live_plotter = self._plotter.live(self._result_file) if self._live_plot else None
+                trace_start = tracer.now()
+                try:
+                    with tracer.span(f"{self.__class__.__name__} {os.path.basename(self._result_file)}"):
+                        yield
+                    completed = True
+                finally:
+                    if self._live_plotter is not None:
+                        self._live_plotter.close()
+                        self._live_plotter = None
+                    self.trace_sweep(trace_start)
+        finally:
+            self.close_checkpoint(completed)
+            self.catalogue_result(completed, time.monotonic() - sweep_start)
+
+    def catalogue_result(self, completed: bool = True, duration: float = None, columns: list = None):
+        """ Index the closed result file in the results catalogue, a catalogue failure never fails the sweep """
+        if self._catalogue_path is None:
+            return
+        try:
+            ResultCatalogue(self._catalogue_path).record(self._result_file, self.result_header(),
+                                                         columns or self.result_columns(), completed, duration)
+        except Exception as error:
+            print(f"[{self.__class__.__name__}] could not catalogue {self._result_file}: {error}")
         
-    def prepare_result_file(self, filename: str = None, abspath: bool = False):
+    def trace_sweep(self, start: int):
+        """ Summarise the instrument transactions of the sweep since start and export its
+            timeline next to the result file """
+        if not tracer.enabled:
+            return
+        self.trace_summary = tracer.summary(start)
+        print(f"[{self.__class__.__name__}] {format_summary(self.trace_summary)}")
+        if self._trace_settings.get("export", True):
+            tracer.export_chrome_trace(f"{self._result_file}.trace.json", start)
+
+    def prepare_result_file(self, filename: str = None, abspath: bool = False, append: bool = False):
         self.result_file = (filename, abspath)
-        return open(f"{self._result_file}.csv", 'w', newline='')
+        return open_result_sink(self._result_settings, self._result_file, self.result_columns(), self.result_header(), append)
+
+    def sweep_plan_hash(self) -> str:
+        """ Digest of everything that defines the points and columns of the current sweep """
+        raise NotImplementedError
+
+    def prepare_checkpoint(self, filename: str = None, abspath: bool = False, resume: bool = False) -> bool:
+        """ Open the checkpoint journal of the sweep. With resume the newest unfinished run
+            of the same plan is continued in its own results directory, its result file is cut
+            back to the last checkpoint. Returns True when a run is resumed """
+        plan_hash = self.sweep_plan_hash()
+        self.result_file = (filename, abspath)
+        journal = None
+        if resume:
+            tester_dir = os.path.dirname(self._results_dir)
+            try:
+                run_dirs = [os.path.join(tester_dir, name) for name in os.listdir(tester_dir)]
+            except OSError:
+                run_dirs = []
+            journal = CheckpointJournal.find_resumable(
+                        [run_dir for run_dir in run_dirs if os.path.isdir(run_dir)],
+                        os.path.basename(self._result_file),
+                        plan_hash)
+        if journal is None:
+            if resume:
+                print(f"[{self.__class__.__name__}] no unfinished run of this sweep, starting a new one")
+            os.makedirs(self._results_dir, exist_ok=True)
+            self._checkpoint = CheckpointJournal(self._result_file, plan_hash).open()
+            return False
+        try:
+            os.rmdir(self._results_dir)
+        except OSError:
+            pass
+        self._results_dir = os.path.dirname(journal.filename)
+        self.result_file = (filename, abspath)
+        truncate_results(self._result_file, journal.rows)
+        self._checkpoint = journal.open(resume=True)
+        print(f"[{self.__class__.__name__}] resuming {self._result_file}, "
+              f"{len(journal.completed)} points already measured")
+        return True
+
+    def commit_checkpoint(self):
+        """ Flush the result file and checkpoint every point recorded so far """
+        self._result_sink.flush()
+        self._checkpoint.commit(self._result_sink.rows)
+
+    def close_checkpoint(self, completed: bool):
+        if self._result_sink is not None:
+            self._checkpoint.commit(self._result_sink.rows)
+            self._result_sink = None
+        if completed:
+            self._checkpoint.finish()
+        self._checkpoint.close()
+        self._checkpoint = None
+
+    def result_columns(self) -> list:
+        """ Names of the recorded columns for the current sweep options """
+        raise NotImplementedError
+
+    def expected_points(self) -> int:
+        """ Rows to preallocate for the current sweep, the records grow past it when needed """
+        return 1024
+
+    @property
+    def results(self) -> np.ndarray:
+        """ Rows of the last sweep as a structured array with a float64 field per result column """
+        return None if self._records is None else self._records.data
+
+    def result_header(self) -> dict:
+        return {
+            "tester"     : self.__class__.__name__,
+            "start time" : self._start_time,
+            "config"     : self._tester_info,
+            "sweep"      : {name: getattr(self, f"_{name.replace(' ', '_')}", value)
+                            for name, value in self._tester_info.items()},
+            "devices"    : {name: device.dev_name.strip() for name, device in self._devices.items()}}
 
     def update_sweep_parameters(self, parameters):
         for name, value in parameters.items():
-            if name == "filename" or name == "abspath":
+            if name in ("filename", "abspath", "resume"):
                 continue
             elif value is not None:
                 self.set_variable_parameter(name, value)
     
     def initialize_tester_info(self, setup):
-        connected_devices = setup[setup["connected devices"]]
+        connected_devices = setup[self._connected_devices or setup["connected devices"]]
         required_devices = setup["required devices"]
+        reset = setup.get("reset instruments", True)
         for dev in required_devices:
             dev_address = connected_devices[dev]
             if "SMU" in dev:
-                self._devices[dev] = SMU(self._res_man, dev_address, dev)
+                self._devices[dev] = instrument_pool.acquire(SMU, self._res_man, dev_address, dev, reset)
+                if setup.get("binary transfer", False):
+                    self._devices[dev].setDataFormat(binary=True)
             elif "LIA" in dev:
-                self._devices[dev] = LIA(self._res_man, dev_address, dev)
+                self._devices[dev] = instrument_pool.acquire(LIA, self._res_man, dev_address, dev, reset)
             else:
                 raise NotImplementedError(f"Unsupported device name {dev}")
 
@@ -82,6 +259,18 @@ class BaseSetup():
             raise Exception("Not all devices are connected")
         
         self._sleep_time    = setup["default sleep"]
+        self._result_settings = setup.get("results", {})
+        self._live_plot     = setup.get("live plot", False)
+        self._settler       = Settler(setup.get("settling", {}))
+        self._heater_settler = Settler({**setup.get("settling", {}), **setup.get("heater settling", {})})
+        self._averager      = Averager(setup.get("averaging", {}))
+        self._trace_settings = setup.get("tracing", {})
+        catalogue = setup.get("catalogue", {})
+        self._catalogue_path = None
+        if catalogue.get("enabled", True):
+            self._catalogue_path = catalogue.get("path") or os.path.join(self._measurement_results_dir, ResultCatalogue.filename)
+        self._io            = ParallelIO(len(self._devices), setup.get("parallel io", False))
+        get_executor(setup.get("async workers", 8))
         tester_name = self.__class__.__name__
         self._tester_info   = setup[tester_name]
             
@@ -97,17 +286,13 @@ class BaseSetup():
         if isinstance(value, (int, float)):
             setattr(self, f"_{name}", value)
         elif isinstance(value, list):
-            if sweep_type == "linear":
+            if sweep_type in ("linear", "adaptive"):
                 setattr(self, f"_{name}", np.arange(*value))
             elif sweep_type == "log":
                 setattr(self, f"_{name}", np.logspace(*value))
             else:
                 raise Exception(f"Invalid sweep type {sweep_type}")
     
-    #def load_setup_config(path="setup.json") -> FullConfig:
-    #    with open(path, "r") as f:
-    #        return FullConfig.parse_raw(f.read())
-
     @property
     def result_file(self) -> str:
         return self._result_file
@@ -135,15 +320,29 @@ class BaseSetup():
     def results_directory(self) -> str:
         return self._results_dir
 
-    def record_measurement(self, measurment):
-        self._csv_writer.writerow(measurment)
+    def record_measurement(self, measurment, point_index: int = None):
+        """ point_index is checkpointed once the row is flushed to the result file """
+        if point_index is not None:
+            self._checkpoint.mark(point_index)
+        tracer.mark("point")
+        self._records.append(measurment)
+        if self._result_sink.write_row(measurment):
+            self._checkpoint.commit(self._result_sink.rows)
+        if self._live_plotter is not None:
+            self._live_plotter.push(measurment)
+        for listener in self._result_listeners:
+            listener(measurment)
+
+    def add_result_listener(self, listener):
+        """ listener(measurment) is called with every recorded row """
+        self._result_listeners.append(listener)
     
     def __enter__(self):
         os.makedirs(self._results_dir, exist_ok=True)
         
     def __exit__(self, exc_type, exc_val, exc_tb):
-        for device in self._devices.values():
-            device.setOff()
+        self._io.run(*(device.setOff for device in self._devices.values()))
+        self._io.shutdown()
         try:
             os.rmdir(self._results_dir)
         except OSError:
@@ -153,89 +352,518 @@ class BaseSetup():
         raise NotImplementedError
         
 class IVTester(BaseSetup):
-    def __init__(self, res_man):
-        super().__init__(res_man)
+    _hardware_sweep = False
+    _sweep_delay = 1e-3
+    _smu_samples = 1
+    _smu_aperture = None
+
+    def __init__(self, res_man, connected_devices = None, results_root = None):
+        super().__init__(res_man, connected_devices, results_root)
         self.smu = self._devices["Heater SMU"]
 
     def __enter__(self):
         super().__enter__()
-        self.smu.setFunctionVoltageFixed()
-        self.smu.setCurrentCompliance(self._compliance)
+        with self.smu.batch():
+            self.smu.setFunctionVoltageFixed()
+            self.smu.setCurrentCompliance(self._compliance)
         return self
         
     def setOutput(self, out):
         self.smu.setVoltage(out)
+
+    @property
+    def averaging(self) -> bool:
+        """ Repeated single readings are averaged unless the SMU reads a sample block itself """
+        return self._averager.enabled and self._smu_samples == 1 and not self._hardware_sweep
+
+    def result_columns(self):
+        columns = ["V out", "V meas", "I meas", "settle time"]
+        if self._smu_samples > 1 and not self._hardware_sweep:
+            columns += ["V std", "I std"]
+        if self.averaging:
+            columns += ["V sem", "I sem", "samples"]
+        return columns
     
+    def sweep_plan_hash(self):
+        return CheckpointJournal.plan_hash(
+                        self.__class__.__name__,
+                        self.result_columns(),
+                        np.atleast_1d(np.asarray(self._smu_voltage, dtype=float)))
+
+    def expected_points(self):
+        return len(np.atleast_1d(self._smu_voltage))
+
     @BaseSetup.setup_fixture
-    def perform_measurements(self, smu_voltage = None, filename:str = None, abspath:bool = False):
-        for v_out in self._smu_voltage:
+    def perform_measurements(self, smu_voltage = None, hardware_sweep:bool = None, filename:str = None, abspath:bool = False, resume:bool = False):
+        if self._hardware_sweep:
+            self.perform_hardware_sweep()
+            return
+        for index, v_out in enumerate(self._smu_voltage):
+            if index in self._checkpoint.completed:
+                continue
             self.setOutput(v_out)
-            time.sleep(self._sleep_time)
-            [V_meas, I_meas] = self.smu.getMeasurement()
-            self.record_measurement([v_out, V_meas, I_meas])
+            reading, settle_time = self._settler.settle(self.smu.getMeasurement, self._sleep_time)
+            self.complete_point(v_out, reading, settle_time, index)
+
+    @BaseSetup.setup_fixture
+    async def perform_measurements_async(self, smu_voltage = None, hardware_sweep:bool = None, filename:str = None, abspath:bool = False, resume:bool = False):
+        """ perform_measurements on an event loop, the settling waits leave the loop free to
+            drive other setups on other instruments """
+        if self._hardware_sweep:
+            await run_blocking(self.perform_hardware_sweep)
+            return
+        smu = AsyncInstrument(self.smu)
+        for index, v_out in enumerate(self._smu_voltage):
+            if index in self._checkpoint.completed:
+                continue
+            await smu.setVoltage(v_out)
+            reading, settle_time = await self._settler.asettle(smu.getMeasurement, self._sleep_time)
+            await run_blocking(self.complete_point, v_out, reading, settle_time, index)
+
+    def complete_point(self, v_out, reading, settle_time, index = None):
+        """ Take the extra samples of a settled point and record it """
+        V_meas, I_meas = reading
+        if self._smu_samples > 1:
+            readings = self.smu.measureMultiple(self._smu_samples, self._smu_aperture)
+            (V_meas, I_meas), (V_std, I_std) = SMU.summarizeReadings(readings)
+            self.record_measurement([v_out, V_meas, I_meas, settle_time, V_std, I_std], index)
+        elif self.averaging:
+            stats = self._averager.average(self.smu.getMeasurement, [V_meas, I_meas])
+            self.record_measurement([v_out, *stats.mean, settle_time, *stats.sem, stats.n], index)
+        else:
+            self.record_measurement([v_out, V_meas, I_meas, settle_time], index)
+
+    def perform_hardware_sweep(self):
+        """ Run the voltages not measured yet on the SMU sweep engine and record them at once """
+        voltages = np.atleast_1d(np.asarray(self._smu_voltage, dtype=float))
+        indices = [index for index in range(len(voltages)) if index not in self._checkpoint.completed]
+        if not indices:
+            return
+        results = self.smu.performVoltageSweep(voltages[indices], self._sweep_delay)
+        for index, (V_meas, I_meas) in zip(indices, results):
+            self.record_measurement([voltages[index], V_meas, I_meas, self._sweep_delay], index)
         
 class ThreeTTester(BaseSetup):
-    def __init__(self, res_man):
-        super().__init__(res_man)
+    _record_drain = False
+    _drain_Vmin = 2
+    _drain_Vmax = 4
+    _drain_Imin = 1e-7
+    _drain_Imax = 15e-6
+    _operation_point_iterations = 10
+    _lia_samples = 1
+    _lia_sample_rate = 1e3
+    _drain_samples = 1
+    _drain_aperture = None
+    _adaptive_column = "R"
+    _adaptive_tolerance = 0.1
+    _adaptive_budget = 20
+    _adaptive_min_step = 0
+    _monitor_rate = 10
+    _monitor_buffer_rows = 36000
+    _monitor_rotate_size = None
+    _monitor_rotate_interval = None
+    _software_lockin_rate = 5e3
+    _software_lockin_samples = 2500
+    _software_lockin_amplitude = 0.1
+    _software_lockin_aperture = None
+
+    def __init__(self, res_man, connected_devices = None, results_root = None):
+        super().__init__(res_man, connected_devices, results_root)
         self.heater             = self._devices["Heater SMU"]
         self.drain              = self._devices["Drain SMU"]
         self.lia                = self._devices["LIA"]
         self._drain_Vcomp = 2.5
         self._drain_Idc = 1e-6
         self._lia_offset = 800e-3
+        self._operation_points_file = os.path.join(
+                        self._measurement_results_dir,
+                        self.__class__.__name__,
+                        "operation_points.json")
+        self._operation_points = self.load_operation_points()
+        self._operation_point = None
             
     def __enter__(self):
         super().__enter__()
-        self.heater.setFunctionVoltageFixed()
-        self.heater.setCurrentCompliance(self._heater_Icomp)
+        with self.heater.batch():
+            self.heater.setFunctionVoltageFixed()
+            self.heater.setCurrentCompliance(self._heater_Icomp)
         self.drain.setFunctionCurrentFixed()
         
         return self
     
     def setOutput(self, heater_voltage:float ,frequency:float, amplitude:float, offset:float):
-        self.heater.setVoltage(heater_voltage)
-        self.lia.setOutputFrequency(frequency)
-        self.lia.setOutputAmplitude(amplitude)
-        self.lia.setOutputOffset(offset)
-        self.drain.setCurrent(self._drain_Idc)
-    
-    def acquire_operation_point(self):
+        self._io.run(
+            partial(self.heater.setVoltage, heater_voltage),
+            partial(self.setLIAOutput, frequency, amplitude, offset),
+            partial(self.drain.setCurrent, self._drain_Idc))
 
-        operation_point_aquired = False
-        for _ in range(10):
-            self.drain.setVoltageCompliance(self._drain_Vcomp)
-            self.drain.setCurrent(self._drain_Idc)
-            self.lia.setOutputOffset(self._lia_offset)
-            v_drain, i_drain = self.drain.getMeasurement()
-            if v_drain > 2 and v_drain < 4:
-                operation_point_aquired = True
-                break
-            elif self.drain.inVoltageCompliance():
-                self._drain_Idc = (self._drain_Idc + 15e-6) / 2
-                
-        return operation_point_aquired
+    def setLIAOutput(self, frequency:float, amplitude:float, offset:float):
+        with self.lia.batch():
+            self.lia.setOutputFrequency(frequency)
+            self.lia.setOutputAmplitude(amplitude)
+            self.lia.setOutputOffset(offset)
+
+    def read_lia_and_drain(self):
+        """ Read the LIA snapshot and the drain SMU concurrently as [X, Y, R, theta, V, I] """
+        lia_meas, drain_meas = self._io.run(self.lia.getLIAMeasurment, self.drain.getMeasurement)
+        return [*lia_meas, *drain_meas]
     
-    @BaseSetup.setup_fixture
-    def perform_measurements(self, heater_voltage = None ,lia_frequency = None, lia_amplitude = None, lia_offset = None, filename: str = None, abspath: bool = False):        
+    @property
+    def averaging(self) -> bool:
+        """ Repeated snapshots are averaged unless the LIA or drain SMU read sample blocks themselves """
+        return (self._averager.enabled and self._lia_samples == 1
+                and not (self._record_drain and self._drain_samples > 1))
+
+    def result_columns(self):
+        columns = ["lia offset", "X", "R", "settle time"]
+        if self._record_drain:
+            columns += ["drain V", "drain I"]
+            if self._drain_samples > 1:
+                columns += ["drain V std", "drain I std"]
+        if self.averaging:
+            columns += ["X sem", "R sem"]
+            if self._record_drain:
+                columns += ["drain V sem", "drain I sem"]
+            columns += ["samples"]
+        return columns
+
+    def compile_sweep_plan(self) -> SweepPlan:
+        """ Build the ordered point table, a heater change costs a heater settle and a
+            frequency change a double settle since the LIA filters have to retune """
         for attr_name in ("_heater_voltage", "_lia_frequency", "_lia_amplitude", "_lia_offset"):
             value = getattr(self, attr_name)
             if isinstance(value, (int, float)):
                 setattr(self, attr_name, [value])
+        axes = {
+            "heater_voltage" : self._heater_voltage,
+            "lia_frequency"  : self._lia_frequency,
+            "lia_amplitude"  : self._lia_amplitude,
+            "lia_offset"     : self._lia_offset}
+        transition_costs = {
+            "heater_voltage" : self._heater_sleep,
+            "lia_frequency"  : 2 * self._sleep_time,
+            "lia_amplitude"  : self._sleep_time,
+            "lia_offset"     : self._sleep_time}
+        return SweepPlan(axes, transition_costs)
+
+    def expected_points(self):
+        return len(self.compile_sweep_plan()) + (self._adaptive_budget if self.adaptive else 0)
+
+    @property
+    def adaptive(self) -> bool:
+        """ Offset sweeps are refined where the adaptive column changes fastest """
+        return self._tester_info["sweep type"] == "adaptive"
+
+    def sweep_plan_hash(self):
+        adaptive = (self._adaptive_column, self._adaptive_tolerance, self._adaptive_budget, self._adaptive_min_step)
+        return CheckpointJournal.plan_hash(
+                        self.__class__.__name__,
+                        self.result_columns(),
+                        adaptive if self.adaptive else None,
+                        self.compile_sweep_plan().points)
+
+    async def setOutput_async(self, heater_voltage:float ,frequency:float, amplitude:float, offset:float):
+        await asyncio.gather(
+            run_blocking(self.heater.setVoltage, heater_voltage),
+            run_blocking(self.setLIAOutput, frequency, amplitude, offset),
+            run_blocking(self.drain.setCurrent, self._drain_Idc))
+
+    def point_reader(self):
+        return self.read_lia_and_drain if self._record_drain else self.lia.getLIAMeasurment
+
+    def measure_point(self, offset, time_constant = None, point_index = None):
+        """ Wait for the LIA to settle at the current setpoint and record the point """
+        read = self.point_reader()
+        meas, settle_time = self._settler.settle(read, self._sleep_time, time_constant)
+        return self.complete_point(offset, read, meas, settle_time, point_index)
+
+    async def measure_point_async(self, offset, time_constant = None, point_index = None):
+        lia = AsyncInstrument(self.lia)
+        if self._record_drain:
+            drain = AsyncInstrument(self.drain)
+            async def read():
+                lia_meas, drain_meas = await asyncio.gather(lia.getLIAMeasurment(), drain.getMeasurement())
+                return [*lia_meas, *drain_meas]
+        else:
+            read = lia.getLIAMeasurment
+        meas, settle_time = await self._settler.asettle(read, self._sleep_time, time_constant)
+        return await run_blocking(self.complete_point, offset, self.point_reader(), meas, settle_time, point_index)
+
+    def complete_point(self, offset, read, meas, settle_time, point_index = None):
+        """ Average or capture the extra samples of a settled point and record it """
+        if self.averaging:
+            stats = self._averager.average(read, meas)
+            sem = [stats.sem[0], stats.sem[2], *stats.sem[4:], stats.n]
+            meas = stats.mean
+        lia_meas, drain_meas = LIA_measurment(*meas[:4]), list(meas[4:])
+        capture_lia = self._lia_samples > 1
+        capture_drain = self._record_drain and self._drain_samples > 1
+        acquisitions = []
+        if capture_lia:
+            acquisitions.append(partial(self.lia.acquireCapture, self._lia_samples, self._lia_capture_rate))
+        if capture_drain:
+            acquisitions.append(partial(self.drain.measureMultiple, self._drain_samples, self._drain_aperture))
+        samples = self._io.run(*acquisitions)
+        if capture_lia:
+            lia_meas = LIA_measurment(*samples.pop(0).mean(axis=0))
+        if capture_drain:
+            drain_mean, drain_std = SMU.summarizeReadings(samples.pop(0))
+            drain_meas = [*drain_mean, *drain_std]
+        measurment = [offset, lia_meas.X ,lia_meas.R, settle_time, *drain_meas]
+        if self.averaging:
+            measurment += sem
+        self.record_measurement(measurment, point_index)
+        return measurment
+
+    def refine_offset_pass(self, offset_pass : OffsetPass, time_constant = None):
+        """ Add offsets to a measured offset pass where the adaptive column changes or bends by
+            more than the adaptive tolerance, round after round in ascending order until the
+            curve is resolved or the adaptive budget of the pass is spent. Refined points are
+            checkpointed like plan points and the finished pass is journaled """
+        column = self.result_columns().index(self._adaptive_column)
+        while offset_pass.refined < self._adaptive_budget:
+            new_offsets = refine(offset_pass.offsets, offset_pass.values, self._adaptive_tolerance,
+                                 self._adaptive_min_step, self._adaptive_budget - offset_pass.refined)
+            if len(new_offsets) == 0:
+                break
+            for offset in new_offsets:
+                self.setOutput(*offset_pass.key, offset)
+                measurment = self.measure_point(offset, time_constant, offset_pass.next_refined_index)
+                offset_pass.add(offset, measurment[column], refined=True)
+        self.commit_checkpoint()
+        self._checkpoint.set_refined(offset_pass.number)
+
+    def load_operation_points(self) -> dict:
+        """ Drain currents found on previous runs, keyed by heater voltage """
+        try:
+            with open(self._operation_points_file, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save_operation_points(self):
+        os.makedirs(os.path.dirname(self._operation_points_file), exist_ok=True)
+        with open(self._operation_points_file, 'w') as file:
+            json.dump(self._operation_points, file, indent=4)
+
+    def bias_drain(self, heater_voltage):
+        """ Source the drain current last found at heater_voltage, so the drain voltage follows
+            the channel resistance and with it the heater temperature """
+        with self.drain.batch():
+            self.drain.setVoltageCompliance(self._drain_Vcomp)
+            self.drain.setCurrent(self._operation_points.get(f"{float(heater_voltage):g}", self._drain_Idc))
+
+    def settle_heater(self, heater_voltage):
+        """ Wait for the biased drain to follow a heater change, the thermal drift is judged
+            over the longer window of the heater settling criterion """
+        self.bias_drain(heater_voltage)
+        return self._heater_settler.settle(self.drain.getMeasurement, self._heater_sleep)
+
+    def measure_drain_voltage(self, current):
+        self.drain.setCurrent(current)
+        (v_drain, _), _ = self._settler.settle(self.drain.getMeasurement, self._sleep_time)
+        return v_drain
+
+    def acquire_operation_point(self, heater_voltage = None):
+        """ Find the drain current that puts the drain voltage inside the operation window,
+            warm started from the current found before at the same heater voltage """
+        if heater_voltage is None:
+            heater_voltage = self._heater_voltage[0]
+        key = f"{float(heater_voltage):g}"
+        self.drain.setVoltageCompliance(self._drain_Vcomp)
+        self.lia.setOutputOffset(np.atleast_1d(self._lia_offset)[0])
+        # a drain clamped at a compliance below Vmax is accepted as before, the search aims
+        # at the middle of the part of the window the drain can reach
+        target = (self._drain_Vmin + min(self._drain_Vmax, self._drain_Vcomp)) / 2
+        self._operation_point = find_operating_point(
+                        self.measure_drain_voltage,
+                        self._operation_points.get(key, self._drain_Idc),
+                        (self._drain_Imin, self._drain_Imax),
+                        (self._drain_Vmin, self._drain_Vmax),
+                        self._operation_point_iterations,
+                        target)
+        self._drain_Idc = self._operation_point.current
+        self.drain.setCurrent(self._drain_Idc)
+        status = "acquired" if self._operation_point.acquired else "not acquired"
+        print(f"[{self.__class__.__name__}] operation point {status}: "
+              f"Idc={self._operation_point.current:.3e} A, Vdrain={self._operation_point.voltage:.3f} V "
+              f"after {self._operation_point.iterations} measurements in {self._operation_point.duration:.2f} s")
+        if self._operation_point.acquired:
+            self._operation_points[key] = self._drain_Idc
+            self.save_operation_points()
+            if self._checkpoint is not None:
+                self._checkpoint.set_operation_point(key, self._drain_Idc)
+        return self._operation_point.acquired
+    
+    def offset_passes(self) -> list:
+        """ The sweep plan as offset passes in execution order. A resumed pass starts from all
+            rows the interrupted run recorded for it, refined ones included, passes that run
+            finished (and refined when adaptive) are left out """
+        plan = self.compile_sweep_plan()
+        print(f"[{self.__class__.__name__}] {len(plan)} points, predicted sweep time {plan.predicted_duration():.1f} s")
+        self._operation_points.update(self._checkpoint.operation_points)
+        columns = self.result_columns()
+        offset_column, value_column = columns.index("lia offset"), columns.index(self._adaptive_column)
+        measured = {}
+        if len(self._checkpoint.points) == len(self._records):
+            measured = dict(zip(self._checkpoint.points, self._records.as_array()))
+        keys = np.column_stack([plan.points[name] for name in ("heater_voltage", "lia_frequency", "lia_amplitude")])
+        starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+        passes = []
+        for number, points in enumerate(np.split(plan.points, starts[1:])):
+            offset_pass = OffsetPass(number, tuple(float(value) for value in keys[starts[number]]),
+                                     points[~np.isin(points["index"], list(self._checkpoint.completed))],
+                                     len(plan) + number * self._adaptive_budget)
+            for index in points["index"]:
+                if index in measured:
+                    offset_pass.add(measured[index][offset_column], measured[index][value_column])
+            for index in range(offset_pass.first_refined, offset_pass.first_refined + self._adaptive_budget):
+                if index in measured:
+                    offset_pass.add(measured[index][offset_column], measured[index][value_column], refined=True)
+            if len(offset_pass.points) or (self.adaptive and number not in self._checkpoint.refined):
+                passes.append(offset_pass)
+        return passes
+
+    def prepare_lia(self):
+        """ Configure the LIA capture when needed, returns the time constant for the settling criterion """
+        time_constant = None
+        if self._settler.criterion == "time constants":
+            time_constant = self.lia.getTimeConstant()
+        if self._lia_samples > 1:
+            self._lia_capture_rate = self.lia.configureCapture(self._lia_sample_rate, self._lia_samples)
+        return time_constant
+
+    @BaseSetup.setup_fixture
+    def perform_measurements(self, heater_voltage = None ,lia_frequency = None, lia_amplitude = None, lia_offset = None, filename: str = None, abspath: bool = False, resume: bool = False):        
+        passes = self.offset_passes()
+        if not passes:
+            return
         self.drain.setOn()
         self.heater.setOn()
-        self.heater.setVoltage(self._heater_voltage[0])
-        time.sleep(self._heater_sleep)
-        self.acquire_operation_point()
-        for hv, f, amp, off in product(self._heater_voltage, self._lia_frequency, self._lia_amplitude, self._lia_offset):
-            self.setOutput(hv, f, amp, off)
-            time.sleep(self._sleep_time)
-            lia_meas = self.lia.getLIAMeasurment()
-            self.record_measurement([off, lia_meas.X ,lia_meas.R])
-        time.sleep(self._heater_sleep)
-
-    def plot(self, plot_filename:str = None):
+        time_constant = self.prepare_lia()
+        # the offset axis is the cheapest and so innermost, each offset pass is refined
+        # once all its coarse points are measured
+        column = self.result_columns().index(self._adaptive_column)
+        heater_voltage = None
+        for offset_pass in passes:
+            if offset_pass.heater_voltage != heater_voltage:
+                heater_voltage = offset_pass.heater_voltage
+                self.heater.setVoltage(heater_voltage)
+                self.settle_heater(heater_voltage)
+                self.acquire_operation_point(heater_voltage)
+            for point in offset_pass.points:
+                self.setOutput(*offset_pass.key, point["lia_offset"])
+                measurment = self.measure_point(point["lia_offset"], time_constant, point["index"])
+                offset_pass.add(point["lia_offset"], measurment[column])
+            if self.adaptive:
+                self.refine_offset_pass(offset_pass, time_constant)
+
+    @BaseSetup.setup_fixture
+    async def perform_measurements_async(self, heater_voltage = None ,lia_frequency = None, lia_amplitude = None, lia_offset = None, filename: str = None, abspath: bool = False, resume: bool = False):
+        """ perform_measurements on an event loop, the heater and LIA settling waits leave the
+            loop free to drive other setups on other instruments. The operation point search
+            and the adaptive refinement run as blocking calls on the instrument executor """
+        passes = self.offset_passes()
+        if not passes:
+            return
+        heater, drain = AsyncInstrument(self.heater), AsyncInstrument(self.drain)
+        await asyncio.gather(drain.setOn(), heater.setOn())
+        time_constant = await run_blocking(self.prepare_lia)
+        column = self.result_columns().index(self._adaptive_column)
+        heater_voltage = None
+        for offset_pass in passes:
+            if offset_pass.heater_voltage != heater_voltage:
+                heater_voltage = offset_pass.heater_voltage
+                await heater.setVoltage(heater_voltage)
+                await run_blocking(self.bias_drain, heater_voltage)
+                await self._heater_settler.asettle(drain.getMeasurement, self._heater_sleep)
+                await run_blocking(self.acquire_operation_point, heater_voltage)
+            for point in offset_pass.points:
+                await self.setOutput_async(*offset_pass.key, point["lia_offset"])
+                measurment = await self.measure_point_async(point["lia_offset"], time_constant, point["index"])
+                offset_pass.add(point["lia_offset"], measurment[column])
+            if self.adaptive:
+                await run_blocking(self.refine_offset_pass, offset_pass, time_constant)
+
+    def monitor(self, duration: float = None, heater_voltage = None, lia_frequency = None, lia_amplitude = None, lia_offset = None, filename: str = None):
+        """ Log X, R and the drain V, I at one fixed setpoint at "monitor rate" samples a second
+            until duration seconds pass or the run is interrupted. The newest rows are kept in
+            self.monitor_buffer, result files rotate by size and age. Returns the achieved timing """
+        self.update_sweep_parameters(dict(heater_voltage=heater_voltage, lia_frequency=lia_frequency,
+                                          lia_amplitude=lia_amplitude, lia_offset=lia_offset))
+        heater_voltage, frequency, amplitude, offset = (
+                        np.atleast_1d(value)[0] for value in
+                        (self._heater_voltage, self._lia_frequency, self._lia_amplitude, self._lia_offset))
+        columns = ["time", "X", "R", "drain V", "drain I"]
+        self.monitor_buffer = RingBuffer(self._monitor_buffer_rows, len(columns))
+        self.result_file = (filename, False)
+        self.drain.setOn()
+        self.heater.setOn()
+        self.heater.setVoltage(heater_voltage)
+        self.settle_heater(heater_voltage)
+        self.acquire_operation_point(heater_voltage)
+        self.setOutput(heater_voltage, frequency, amplitude, offset)
+        self._settler.settle(self.lia.getLIAMeasurment, self._sleep_time)
+        timing = TimingMonitor(self._monitor_rate)
+        with RotatingResultSink(self._result_settings, self._result_file, columns, self.result_header(),
+                                self._monitor_rotate_size, self._monitor_rotate_interval) as sink:
+            start = time.monotonic()
+            try:
+                for tick, deadline in ticks(1 / self._monitor_rate, start):
+                    if duration is not None and deadline - start >= duration:
+                        break
+                    timing.record(tick, deadline)
+                    X, _, R, _, V, I = self.read_lia_and_drain()
+                    row = [time.monotonic() - start, X, R, V, I]
+                    self.monitor_buffer.append(row)
+                    sink.write_row(row)
+            except KeyboardInterrupt:
+                pass
+        report = timing.report()
+        print(f"[{self.__class__.__name__}] monitored {report.samples} samples in {report.duration:.1f} s "
+              f"at {report.rate:.2f}/{report.target_rate:g} samples/s, jitter {report.jitter * 1e3:.2f} ms, "
+              f"max lateness {report.max_lateness * 1e3:.2f} ms, {report.missed} missed, "
+              f"{len(sink.filenames)} result files")
+        return report
+
+    def measure_frequency_response(self, heater_voltage = None, lia_frequency = None, amplitude: float = None, filename: str = None):
+        """ Drain response at every lia frequency from a single software lock-in capture at the
+            operation point instead of one settled LIA reading per frequency. The drain SMU
+            adds a multitone of amplitude times Idc to its current and digitises the drain
+            voltage, so X, Y, R and theta are the drain response dV/dI and not the gate driven
+            response of perform_measurements. Records and returns them with the measured frequencies """
+        self.update_sweep_parameters(dict(heater_voltage=heater_voltage, lia_frequency=lia_frequency))
+        heater_voltage = np.atleast_1d(self._heater_voltage)[0]
+        amplitude = self._software_lockin_amplitude if amplitude is None else amplitude
+        self.drain.setOn()
+        self.heater.setOn()
+        self.heater.setVoltage(heater_voltage)
+        self.settle_heater(heater_voltage)
+        self.acquire_operation_point(heater_voltage)
+        lock_in = SoftwareLockIn(self.drain, self._software_lockin_rate, self._software_lockin_samples,
+                                 self._tester_info.get("software lockin window", "hann"), self._software_lockin_aperture)
+        frequencies, meas = lock_in.measure(np.atleast_1d(self._lia_frequency), amplitude * self._drain_Idc, self._drain_Idc)
+        self.result_file = (filename, False)
+        os.makedirs(self._results_dir, exist_ok=True)
+        columns = ["lia frequency", "X", "Y", "R", "theta"]
+        with open_result_sink(self._result_settings, self._result_file, columns, self.result_header()) as sink:
+            for row in zip(frequencies, *meas):
+                sink.write_row([float(value) for value in row])
+        self.catalogue_result(columns=columns)
+        return frequencies, meas
+
+    def plot(self, plot_filename:str = None, wait:bool = False):
+        """ Render the result plot in a background process, returns a Future of the image path """
         if plot_filename is  None:
-            self._plotter.plot_2d(self._result_file)
+            res_file_path = self._result_file
         else:
             res_file_path = os.path.join(self._results_dir, plot_filename)
-            self._plotter.plot_2d(res_file_path)
\ No newline at end of file
+        future = self._plotter.plot_2d_async(res_file_path)
+        if wait:
+            future.result()
+        return future
+
+testers = {
+    "IVTester"     : IVTester,
+    "ThreeTTester" : ThreeTTester,
+}
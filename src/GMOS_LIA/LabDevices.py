@@ -1,5 +1,13 @@
-import pyvisa as pyv
+import math
+import time
+import threading
+import numpy as np
 from collections import namedtuple
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from GMOS_LIA.Tracing import tracer
+if TYPE_CHECKING:
+    import pyvisa as pyv
 
 LIA_measurment = namedtuple('LIAMeas', ['X', 'Y', 'R', 'theta'])
 
@@ -8,106 +16,437 @@ class LIA_consants():
     output_channel2 = 1
     output_channel_xy = 0
     output_channel_rth = 1
+    capture_x = 0
+    capture_xy = 1
+    capture_rt = 2
+    capture_xyrt = 3
+    capture_values = {capture_x: 1, capture_xy: 2, capture_rt: 2, capture_xyrt: 4}
 
 class Instrument:
     res_man = None
-    def __init__(self, res_man : pyv.ResourceManager, gpib_address, inst_name):
+    cache_setpoints = True
+    command_root = ""
+    def __init__(self, res_man : "pyv.ResourceManager", gpib_address, inst_name, reset=True):
         """ connected to device: {self.dev_name} at address {gpib_address} """
-        self.inst = res_man.open_resource(gpib_address)
-        self.reset()
-        self.dev_name = self.inst.query("*IDN?")
+        self.address = gpib_address
         self.inst_name = inst_name
+        self._setpoints = {}
+        self.skipped_writes = 0
+        self._batch_depth = 0
+        self._batched_commands = []
+        self._lock = threading.RLock()
+        self.inst = res_man.open_resource(gpib_address)
+        if reset:
+            self.reset()
+        self.dev_name = self.query("*IDN?")
         
     def __str__(self):
         return f"{self.dev_name} as instance {self.inst}"
         
+    def write(self, command):
+        """ Send command to the instrument, a reset drops all cached setpoints """
+        with self._lock:
+            if command == "*RST":
+                self.invalidateCache()
+            if self._batch_depth:
+                self._batched_commands.append(command)
+            else:
+                self._send(command)
+
+    def query(self, command):
+        """ Send query to the instrument and return its response, batched commands are sent along with it """
+        with self._lock:
+            if self._batched_commands:
+                command = self._joinCommands(self._batched_commands + [command])
+                self._batched_commands = []
+            return self._ask(command)
+
+    def queryBinary(self, command, datatype='f', is_big_endian=False):
+        """ Send query and read its IEEE binary block response into a numpy array """
+        with self._lock:
+            self.flushBatch()
+            return self._askBinary(command, datatype, is_big_endian)
+
+    def _send(self, command):
+        if not tracer.enabled:
+            return self.inst.write(command)
+        start = tracer.now()
+        self.inst.write(command)
+        tracer.record("write", self.inst_name, command, len(command) + 1, start)
+
+    def _ask(self, command):
+        if not tracer.enabled:
+            return self.inst.query(command)
+        start = tracer.now()
+        response = self.inst.query(command)
+        tracer.record("query", self.inst_name, command, len(command) + 1 + len(response), start)
+        return response
+
+    def _askBinary(self, command, datatype, is_big_endian):
+        if not tracer.enabled:
+            return self.inst.query_binary_values(command, datatype=datatype,
+                                                 is_big_endian=is_big_endian, container=np.array)
+        start = tracer.now()
+        data = self.inst.query_binary_values(command, datatype=datatype,
+                                             is_big_endian=is_big_endian, container=np.array)
+        tracer.record("binary", self.inst_name, command, len(command) + 1 + data.nbytes, start)
+        return data
+
+    @contextmanager
+    def batch(self):
+        """ Coalesce all writes in the block into a single message sent when the block exits """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                if self._batch_depth == 1:
+                    self._batched_commands = []
+                    self.invalidateCache()
+                raise
+            finally:
+                self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flushBatch()
+
+    def flushBatch(self):
+        """ Send the queued batch commands as one message """
+        with self._lock:
+            if self._batched_commands:
+                command = self._joinCommands(self._batched_commands)
+                self._batched_commands = []
+                self._send(command)
+
+    def _joinCommands(self, commands):
+        commands = (command.lstrip(":") for command in commands)
+        return ";".join(command if command.startswith("*") else self.command_root + command for command in commands)
+
+    def writeSetting(self, header, value, force=False):
+        """ Write '{header} {value}' unless value is already the last value written for header """
+        with self._lock:
+            if self.cache_setpoints and not force and header in self._setpoints and self._setpoints[header] == value:
+                self.skipped_writes += 1
+                return
+            self.write(f'{header} {value}')
+            self._setpoints[header] = value
+
+    @contextmanager
+    def extendedTimeout(self, seconds):
+        """ Hold the instrument and extend its I/O timeout by seconds for a long operation """
+        with self._lock:
+            timeout = self.inst.timeout
+            self.inst.timeout = timeout + 1e3 * seconds
+            try:
+                yield self
+            finally:
+                self.inst.timeout = timeout
+
+    def invalidateCache(self):
+        """ Forget all cached setpoints so the next write of each setting is sent """
+        self._setpoints.clear()
+
     def reset(self):
-        self.inst.write("*RST")
-        self.inst.write("*CLS")
+        self.write("*RST")
+        self.write("*CLS")
         
+    def isOpen(self) -> bool:
+        """ False once the session was closed, e.g. by closing its resource manager """
+        from pyvisa.errors import InvalidSession
+        try:
+            self.inst.session
+        except InvalidSession:
+            return False
+        return True
+
     def __del__(self):
         """{self.inst_name} instance is closed"""
         self.inst.close()
 
+class InstrumentPool():
+    """ Open instruments of the process keyed by VISA address. A setup reuses an instrument
+        that is still open instead of reopening, resetting and identifying it again, so the
+        instrument keeps its warmed up state and its setpoint cache stays valid """
+    def __init__(self):
+        self._instruments = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, device_class, res_man, gpib_address, inst_name, reset=True):
+        """ Pooled device_class instance at gpib_address, reset only applies when it is opened """
+        with self._lock:
+            device = self._instruments.get(gpib_address)
+            if type(device) is not device_class or not device.isOpen():
+                device = device_class(res_man, gpib_address, inst_name, reset)
+                self._instruments[gpib_address] = device
+            device.inst_name = inst_name
+            return device
+
+    def release(self, gpib_address=None):
+        """ Drop one pooled instrument or all of them, they are closed once unreferenced """
+        with self._lock:
+            if gpib_address is None:
+                self._instruments.clear()
+            else:
+                self._instruments.pop(gpib_address, None)
+
+instrument_pool = InstrumentPool()
+
 class LIA(Instrument):
-    def __init__(self, res_man, gpib_address, inst_name):
+    capture_margin = 1.0
+    def __init__(self, res_man, gpib_address, inst_name, reset=True):
         """ [Instrument] Connected to LIA name: '{self.inst_name}' """
-        super().__init__(res_man, gpib_address, inst_name)
+        super().__init__(res_man, gpib_address, inst_name, reset)
     
-    def setChannelOutputFunction(self, output_channel, output_function):
-        self.inst.write(f'COUT {output_channel}, {output_function}')
+    def setChannelOutputFunction(self, output_channel, output_function, force=False):
+        self.writeSetting(f'COUT {output_channel},', output_function, force)
     
-    def setOutputFrequency(self, frequency):
-        self.inst.write(f'FREQ {frequency}')
+    def setOutputFrequency(self, frequency, force=False):
+        self.writeSetting('FREQ', frequency, force)
         
-    def setOutputAmplitude(self, amplitude):
-        self.inst.write(f'SLVL {amplitude}')
+    def setOutputAmplitude(self, amplitude, force=False):
+        self.writeSetting('SLVL', amplitude, force)
 
-    def setOutputOffset(self, offset):
-        self.inst.write(f'SOFF {offset}')
+    def setOutputOffset(self, offset, force=False):
+        self.writeSetting('SOFF', offset, force)
 
     def autoPhase(self):
-        self.inst.write(f'APHS')
+        self.write(f'APHS')
+
+    def getTimeConstant(self):
+        """ Read the filter time constant in seconds, OFLT index i is 1 or 3 x 10^(i//2 - 6) s """
+        index = int(self.query('OFLT?').strip())
+        return (1, 3)[index % 2] * 10.0 ** (index // 2 - 6)
         
     def getLIAMeasurment(self):
-        return LIA_measurment(*self.inst.query('SNAPD?').strip().split(","))
+        """ X, Y, R and theta as floats from one snapshot """
+        return LIA_measurment(*map(float, self.query('SNAPD?').split(",")))
+
+    def configureCapture(self, sample_rate, n_samples, config=LIA_consants.capture_xyrt, force=False):
+        """ Set the internal data capture for n_samples at the fastest rate max / 2^n not above
+            sample_rate and return the actual rate """
+        max_rate = float(self.query('CAPTURERATEMAX?').strip())
+        rate_divider = min(max(math.ceil(math.log2(max_rate / sample_rate)), 0), 20)
+        kbytes = max(math.ceil(n_samples * LIA_consants.capture_values[config] * 4 / 1024), 1)
+        with self.batch():
+            self.writeSetting('CAPTURECFG', config, force)
+            self.writeSetting('CAPTURELEN', kbytes, force)
+            self.writeSetting('CAPTURERATE', rate_divider, force)
+        self._capture_config = config
+        return max_rate / 2 ** rate_divider
+
+    def startCapture(self):
+        self.write('CAPTURESTART ONE, IMM')
+
+    def stopCapture(self):
+        self.write('CAPTURESTOP')
+
+    def getCaptureData(self, n_samples):
+        """ Read the first n_samples of the capture buffer with one binary block transfer """
+        values = LIA_consants.capture_values[self._capture_config]
+        kbytes = max(math.ceil(n_samples * values * 4 / 1024), 1)
+        data = self.queryBinary(f'CAPTUREGET? 0, {kbytes}', datatype='f')
+        return data.reshape(-1, values)[:n_samples]
+
+    def acquireCapture(self, n_samples, sample_rate):
+        """ Capture n_samples at the configured sample_rate, returns an (n_samples, values) array.
+            Raises TimeoutError when the capture is not filled within twice its duration plus
+            capture_margin seconds, the capture is stopped either way """
+        duration = n_samples / sample_rate
+        n_bytes = n_samples * LIA_consants.capture_values[self._capture_config] * 4
+        with self.extendedTimeout(duration):
+            self.startCapture()
+            try:
+                deadline = time.monotonic() + 2 * duration + self.capture_margin
+                time.sleep(duration)
+                while int(self.query('CAPTUREBYTES?').strip()) < n_bytes:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"{self.inst_name} captured less than {n_samples} samples "
+                                           f"in {2 * duration + self.capture_margin:.2f} s")
+                    time.sleep(min(10 / sample_rate, 0.1))
+            finally:
+                self.stopCapture()
+            return self.getCaptureData(n_samples)
     
     def setOff(self):
-        self.setOutputOffset(0)
-        self.setOutputAmplitude(0)
+        with self.batch():
+            self.setOutputOffset(0, force=True)
+            self.setOutputAmplitude(0, force=True)
         
 class SMU(Instrument):
-    def __init__(self, res_man, gpib_address, inst_name):
+    command_root = ":"
+    def __init__(self, res_man, gpib_address, inst_name, reset=True):
         """ [Instrument] Connected to SMU name: '{self.inst_name}' """
-        super().__init__(res_man, gpib_address, inst_name)
-        self.setOutputFloating()
+        super().__init__(res_man, gpib_address, inst_name, reset)
+        with self.batch():
+            self.setOutputFloating()
+            self.setMeasurementElements()
+            self.setSinglePoint()
         
-    def setFunctionVoltageFixed(self):
+    def setFunctionVoltageFixed(self, force=False):
         """ Set SMU function to fixed voltage source """
-        self.inst.write('FUNC:MODE VOLT')
-        self.inst.write('SOUR:VOLT:MODE FIX')
+        with self.batch():
+            self.writeSetting('FUNC:MODE', 'VOLT', force)
+            self.writeSetting('SOUR:VOLT:MODE', 'FIX', force)
         
-    def setFunctionCurrentFixed(self):
+    def setFunctionCurrentFixed(self, force=False):
         """ Set SMU function to fixed current source """
-        self.inst.write('FUNC:MODE CURR')
-        self.inst.write('SOUR:CURR:MODE FIX')
+        with self.batch():
+            self.writeSetting('FUNC:MODE', 'CURR', force)
+            self.writeSetting('SOUR:CURR:MODE', 'FIX', force)
     
-    def setVoltage(self, voltage):
+    def setVoltage(self, voltage, force=False):
         """ Set SMU output voltage """
-        self.inst.write(f'SOUR:VOLT {voltage}')
+        self.writeSetting('SOUR:VOLT', voltage, force)
         
-    def setCurrent(self, current):
+    def setCurrent(self, current, force=False):
         """ Set SMU output current """
-        self.inst.write(f'SOUR:CURR {current}')
+        self.writeSetting('SOUR:CURR', current, force)
             
     def setOn(self):
         """ Power on the SMU output """
-        self.inst.write('OUTP 1')
+        self.write('OUTP 1')
     
     def setOff(self):
         """ Power off the SMU output """
-        self.inst.write('OUTP 0')
+        self.write('OUTP 0')
         
-    def setVoltageCompliance(self, comp):
+    def setVoltageCompliance(self, comp, force=False):
         """ Set SMU output voltage compliance """
-        self.inst.write(f'SENS:VOLT:PROT {comp}')
+        self.writeSetting('SENS:VOLT:PROT', comp, force)
 
-    def setCurrentCompliance(self, comp):
+    def setCurrentCompliance(self, comp, force=False):
         """ Set SMU output current compliance """
-        self.inst.write(f'SENS:CURR:PROT {comp}')
+        self.writeSetting('SENS:CURR:PROT', comp, force)
     
     def inVoltageCompliance(self):
-        return self.inst.query(":SENS:VOLT:PROT:TRIP?").strip() == '1'
+        return self.query(":SENS:VOLT:PROT:TRIP?").strip() == '1'
         
     def inCurrentCompliance(self):
-        return self.inst.query(":SENS:CURR:PROT:TRIP?").strip() == '1'
+        return self.query(":SENS:CURR:PROT:TRIP?").strip() == '1'
     
+    def setMeasurementElements(self, force=False):
+        """ Measure voltage and current together and report them in this order """
+        self.writeSetting('SENS:FUNC', '"VOLT","CURR"', force)
+        self.writeSetting('FORM:ELEM:SENS', 'VOLT,CURR', force)
+
+    def setDataFormat(self, binary=True, force=False):
+        """ Select IEEE-754 double precision binary or ASCII responses for numeric data """
+        with self.batch():
+            self.writeSetting('FORM:DATA', 'REAL,64' if binary else 'ASC', force)
+            self.writeSetting('FORM:BORD', 'NORM', force)
+
+    @property
+    def binaryFormat(self):
+        """ A reset returns the SMU to ASCII and drops the cached format with it """
+        return self._setpoints.get('FORM:DATA') == 'REAL,64'
+
+    def readArray(self, command):
+        """ Query numeric data in the current data format as a flat float array """
+        if self.binaryFormat:
+            return self.queryBinary(command, datatype='d', is_big_endian=True)
+        return np.array(self.query(command).strip().split(','), dtype=float)
+
+    def setSinglePoint(self, force=False):
+        """ Trigger one reading per measurement again after a sweep armed a trigger count or timer """
+        with self.batch():
+            self.writeSetting('TRIG:SOUR', 'AINT', force)
+            self.writeSetting('TRIG:COUN', 1, force)
+
     def getMeasurement(self):
-        """ Read SMU current and voltage """
-        current = float(self.inst.query('MEAS:CURR:DC?').strip())
-        voltage = float(self.inst.query('MEAS:VOLT:DC?').strip())
-        return [voltage, current]
+        """ Read SMU voltage and current with a single query """
+        with self.batch():
+            self.setMeasurementElements()
+            self.setSinglePoint()
+            voltage, current = self.readArray('MEAS?')
+        return [float(voltage), float(current)]
+
+    def setAperture(self, aperture, force=False):
+        """ Set the integration time of one voltage and current reading """
+        with self.batch():
+            self.writeSetting('SENS:VOLT:APER', aperture, force)
+            self.writeSetting('SENS:CURR:APER', aperture, force)
+
+    def measureMultiple(self, n_samples, aperture=None, delay=0):
+        """ Take n_samples readings at the present output in one triggered acquisition,
+            returns an (n_samples, 2) array of [voltage, current] """
+        with self.batch():
+            if aperture is not None:
+                self.setAperture(aperture)
+            self.armSweepTrigger(n_samples, delay)
+        return self.runSweep(n_samples, delay + (aperture or 0))
+
+    @staticmethod
+    def summarizeReadings(readings):
+        """ Column wise mean and sample standard deviation of an (N, 2) readings array """
+        readings = np.asarray(readings, dtype=float)
+        std = readings.std(axis=0, ddof=1) if len(readings) > 1 else np.zeros(readings.shape[1])
+        return readings.mean(axis=0), std
         
-    def setOutputFloating(self):
+    def setOutputFloating(self, force=False):
         """ Set SMU output to floating when off """
-        self.inst.write("OUTP:LOW FLO")
+        self.writeSetting("OUTP:LOW", "FLO", force)
+
+    def setVoltageListSweep(self, voltages, force=False):
+        """ Upload voltages as the SMU internal list sweep """
+        with self.batch():
+            self.writeSetting('FUNC:MODE', 'VOLT', force)
+            self.writeSetting('SOUR:VOLT:MODE', 'LIST', force)
+            self.writeSetting('SOUR:LIST:VOLT', ','.join(f'{v:.9g}' for v in voltages), force)
+
+    def setCurrentListSweep(self, currents, force=False):
+        """ Upload currents as the SMU internal list sweep """
+        with self.batch():
+            self.writeSetting('FUNC:MODE', 'CURR', force)
+            self.writeSetting('SOUR:CURR:MODE', 'LIST', force)
+            self.writeSetting('SOUR:LIST:CURR', ','.join(f'{i:.9g}' for i in currents), force)
+
+    def setVoltageLinearSweep(self, start, stop, points, force=False):
+        """ Set SMU internal staircase sweep from start to stop """
+        with self.batch():
+            self.writeSetting('FUNC:MODE', 'VOLT', force)
+            self.writeSetting('SOUR:VOLT:MODE', 'SWE', force)
+            self.writeSetting('SOUR:VOLT:STAR', start, force)
+            self.writeSetting('SOUR:VOLT:STOP', stop, force)
+            self.writeSetting('SOUR:SWE:POIN', points, force)
+
+    def armSweepTrigger(self, points, delay, period=None, force=False):
+        """ Arm the trigger model for points steps with a source to measure delay. Steps follow
+            each other as fast as the SMU can, or every period seconds on the trigger timer """
+        with self.batch():
+            self.setMeasurementElements(force)
+            if period is None:
+                self.writeSetting('TRIG:SOUR', 'AINT', force)
+            else:
+                self.writeSetting('TRIG:SOUR', 'TIM', force)
+                self.writeSetting('TRIG:TIM', period, force)
+            self.writeSetting('TRIG:COUN', points, force)
+            self.writeSetting('TRIG:ACQ:DEL', delay, force)
+
+    def runSweep(self, points, delay):
+        """ Run the armed sweep and fetch all [voltage, current] pairs in one transfer """
+        with self.extendedTimeout(points * (delay + 0.1)):
+            with self.batch():
+                self.write('INIT')
+                self.query('*OPC?')
+            data = self.readArray('FETC:ARR?')
+        return data.reshape(-1, 2)
+
+    def performVoltageSweep(self, voltages, delay):
+        """ Measure [voltage, current] at each of voltages with the hardware sweep engine """
+        self.setVoltageListSweep(voltages)
+        self.armSweepTrigger(len(voltages), delay)
+        results = self.runSweep(len(voltages), delay)
+        self.writeSetting('SOUR:VOLT:MODE', 'FIX')
+        return results
+
+    def performCurrentSweep(self, currents, delay, aperture=None, period=None):
+        """ Measure [voltage, current] at each of currents with the hardware sweep engine, a
+            list of samples of a waveform gives the response digitised step by step. A period
+            paces the steps on the trigger timer so they are evenly spaced in time """
+        with self.batch():
+            self.setCurrentListSweep(currents)
+            if aperture is not None:
+                self.setAperture(aperture)
+            self.armSweepTrigger(len(currents), delay, period)
+        results = self.runSweep(len(currents), max(delay + (aperture or 0), period or 0))
+        self.writeSetting('SOUR:CURR:MODE', 'FIX')
+        return results
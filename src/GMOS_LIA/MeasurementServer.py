@@ -0,0 +1,250 @@
+import json
+import queue
+import socket
+import itertools
+import threading
+import socketserver
+import traceback
+from GMOS_LIA.LIASetup import testers
+from GMOS_LIA.ResultSinks import _to_json
+
+class Job():
+    """ One queued sweep, its rows and status changes are published to the subscribed clients """
+    def __init__(self, job_id : int, tester : str, parameters : dict, priority : int):
+        self.id = job_id
+        self.tester = tester
+        self.parameters = parameters
+        self.priority = priority
+        self.status = "queued"
+        self.result_file = None
+        self.error = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        messages = queue.Queue()
+        with self._lock:
+            self._subscribers.append(messages)
+        return messages
+
+    def unsubscribe(self, messages : queue.Queue):
+        with self._lock:
+            if messages in self._subscribers:
+                self._subscribers.remove(messages)
+
+    def publish(self, message : dict):
+        message = dict(message, job=self.id)
+        with self._lock:
+            for messages in self._subscribers:
+                messages.put(message)
+
+    def set_status(self, status : str, **details):
+        self.status = status
+        self.publish(dict(details, status=status))
+
+    def transition(self, expected : str, status : str, **details) -> bool:
+        """ set_status only when the status still is expected, checked and changed under the
+            job lock so a cancel and the start of the job cannot both succeed """
+        with self._lock:
+            if self.status != expected:
+                return False
+            self.status = status
+        self.publish(dict(details, status=status))
+        return True
+
+    def describe(self) -> dict:
+        return {"job": self.id, "tester": self.tester, "parameters": self.parameters,
+                "priority": self.priority, "status": self.status,
+                "result file": self.result_file, "error": self.error}
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """ JSON lines requests, every request line is answered by one or more JSON lines """
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not self.server.measurement_server.handle_request(request, self.send):
+                    return
+            except (ConnectionError, OSError):
+                return
+            except Exception as error:
+                self.send({"status": "error", "error": str(error)})
+
+    def send(self, message : dict):
+        self.wfile.write((json.dumps(message, default=_to_json) + "\n").encode())
+        self.wfile.flush()
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+class MeasurementServer():
+    """ Long lived owner of the bench instruments. Clients submit IVTester/ThreeTTester sweeps
+        with parameter overrides, the sweeps run one at a time from a priority queue (higher
+        priority first, then submission order) and their rows are streamed to the clients.
+        address is a (host, port) tuple for localhost TCP or a path for a Unix socket """
+    def __init__(self, res_man, address=("127.0.0.1", 5025), connected_devices : str = None):
+        self._res_man = res_man
+        self._connected_devices = connected_devices
+        self._jobs = {}
+        self._queue = queue.PriorityQueue()
+        self._job_ids = itertools.count(1)
+        if isinstance(address, str):
+            self._server = _UnixServer(address, _RequestHandler)
+        else:
+            self._server = _TCPServer(address, _RequestHandler)
+        self._server.measurement_server = self
+        self._worker = threading.Thread(target=self._run_jobs, daemon=True)
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def serve_forever(self):
+        self._worker.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._queue.put((float("-inf"), 0, None))
+            self._worker.join()
+            self._server.server_close()
+
+    def start(self) -> threading.Thread:
+        """ Serve in a background thread, returns the thread """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self._server.shutdown()
+
+    def submit(self, tester : str, parameters : dict = None, priority : int = 0) -> Job:
+        if tester not in testers:
+            raise Exception(f"Unsupported tester {tester}")
+        job = Job(next(self._job_ids), tester, parameters or {}, priority)
+        self._jobs[job.id] = job
+        return job
+
+    def enqueue(self, job : Job):
+        self._queue.put((-job.priority, job.id, job))
+
+    def cancel(self, job_id : int) -> bool:
+        """ Cancel a job that has not started yet """
+        job = self._jobs.get(job_id)
+        return job is not None and job.transition("queued", "cancelled")
+
+    def handle_request(self, request : dict, send) -> bool:
+        """ Answer one request through send(message), returns False to close the connection """
+        command = request.get("command")
+        if command == "submit":
+            job = self.submit(request["tester"], request.get("parameters"), request.get("priority", 0))
+            messages = job.subscribe() if request.get("stream", True) else None
+            self.enqueue(job)
+            send(job.describe())
+            if messages is not None:
+                try:
+                    while True:
+                        message = messages.get()
+                        send(message)
+                        if message.get("status") in ("done", "failed", "cancelled"):
+                            break
+                finally:
+                    job.unsubscribe(messages)
+        elif command == "status":
+            jobs = [self._jobs[request["job"]]] if "job" in request else list(self._jobs.values())
+            send({"status": "ok", "jobs": [job.describe() for job in jobs]})
+        elif command == "cancel":
+            send({"status": "ok" if self.cancel(request["job"]) else "error", "job": request["job"]})
+        elif command == "shutdown":
+            send({"status": "ok"})
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return False
+        else:
+            raise Exception(f"Invalid command {command}")
+        return True
+
+    def _run_jobs(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            if not job.transition("queued", "running"):
+                continue
+            try:
+                self.run_job(job)
+                job.set_status("done", **{"result file": job.result_file})
+            except Exception as error:
+                job.error = str(error)
+                traceback.print_exc()
+                job.set_status("failed", error=job.error)
+
+    def run_job(self, job : Job):
+        tester_class = testers[job.tester]
+        with tester_class(self._res_man, self._connected_devices) as tester:
+            tester.add_result_listener(lambda measurment: job.publish({"row": list(measurment)}))
+            tester.perform_measurements(**job.parameters)
+            job.result_file = tester.result_file
+
+class MeasurementClient():
+    """ Thin client of a MeasurementServer """
+    def __init__(self, address=("127.0.0.1", 5025), timeout : float = None):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address)
+        self._file = self._socket.makefile('rwb')
+
+    def _send(self, request : dict):
+        self._file.write((json.dumps(request, default=_to_json) + "\n").encode())
+        self._file.flush()
+
+    def _receive(self) -> dict:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Measurement server closed the connection")
+        return json.loads(line)
+
+    def submit(self, tester : str, parameters : dict = None, priority : int = 0):
+        """ Queue a sweep and yield the server messages, the queued job first, then its
+            status changes and rows as they are recorded, until the job ends """
+        self._send({"command": "submit", "tester": tester, "parameters": parameters or {},
+                    "priority": priority, "stream": True})
+        while True:
+            message = self._receive()
+            yield message
+            if message.get("status") in ("done", "failed", "cancelled", "error"):
+                return
+
+    def queue(self, tester : str, parameters : dict = None, priority : int = 0) -> int:
+        """ Queue a sweep without waiting for it, returns the job id """
+        self._send({"command": "submit", "tester": tester, "parameters": parameters or {},
+                    "priority": priority, "stream": False})
+        return self._receive()["job"]
+
+    def status(self, job_id : int = None) -> list:
+        self._send({"command": "status"} if job_id is None else {"command": "status", "job": job_id})
+        return self._receive()["jobs"]
+
+    def cancel(self, job_id : int) -> bool:
+        self._send({"command": "cancel", "job": job_id})
+        return self._receive()["status"] == "ok"
+
+    def shutdown(self):
+        self._send({"command": "shutdown"})
+        self._receive()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,77 @@
+import time
+from collections import namedtuple
+import numpy as np
+from GMOS_LIA.StreamingStats import RunningStats
+
+MonitorReport = namedtuple('MonitorReport', ['samples', 'duration', 'rate', 'target_rate', 'jitter', 'max_lateness', 'missed'])
+
+class RingBuffer():
+    """ Fixed size row store for the recent part of an endless acquisition,
+        the newest rows overwrite the oldest so memory never grows """
+    def __init__(self, rows : int, columns : int):
+        self._data = np.full((max(int(rows), 1), columns), np.nan)
+        self._next = 0
+        self.count = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def append(self, row):
+        self._data[self._next] = row
+        self._next = (self._next + 1) % len(self._data)
+        self.count += 1
+
+    def latest(self, n : int = None) -> np.ndarray:
+        """ Copy of the newest n rows, oldest first """
+        n = len(self) if n is None else min(n, len(self))
+        return np.take(self._data, np.arange(self._next - n, self._next), axis=0, mode='wrap')
+
+    def __len__(self):
+        return min(self.count, len(self._data))
+
+def ticks(period : float, start : float = None):
+    """ Yields (tick, deadline) on the fixed grid start + tick * period, sleeping until each
+        deadline. Deadlines are never accumulated from sleeps, so the schedule does not drift,
+        and ticks already over when the caller returns are skipped instead of bursting """
+    start = time.monotonic() if start is None else start
+    tick = 0
+    while True:
+        deadline = start + tick * period
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield tick, deadline
+        tick = max(tick + 1, int(np.ceil((time.monotonic() - start) / period)))
+
+class TimingMonitor():
+    """ Achieved rate and jitter of a scheduled acquisition """
+    def __init__(self, rate : float):
+        self._rate = rate
+        self._lateness = RunningStats()
+        self._max_lateness = 0
+        self._start = None
+        self._last_tick = -1
+        self.missed = 0
+
+    def record(self, tick : int, deadline : float):
+        now = time.monotonic()
+        if self._start is None:
+            self._start = deadline
+        lateness = now - deadline
+        self._lateness.push(lateness)
+        self._max_lateness = max(self._max_lateness, lateness)
+        self.missed += tick - self._last_tick - 1
+        self._last_tick = tick
+
+    def report(self) -> MonitorReport:
+        samples = self._lateness.n
+        duration = time.monotonic() - self._start if samples else 0
+        return MonitorReport(
+                    samples,
+                    duration,
+                    samples / duration if duration > 0 else 0,
+                    self._rate,
+                    float(self._lateness.std) if samples > 1 else 0,
+                    self._max_lateness,
+                    self.missed)
@@ -0,0 +1,69 @@
+import time
+from collections import namedtuple
+
+OperatingPoint = namedtuple('OperatingPoint', ['current', 'voltage', 'acquired', 'iterations', 'duration'])
+
+def find_operating_point(measure, start : float, bounds : tuple, window : tuple, max_iterations : int = 10,
+                         target : float = None) -> OperatingPoint:
+    """ Find a current inside bounds whose measured voltage lies inside window.
+        measure(current) sets the current and returns the settled voltage. The target, the
+        window center by default, is bracketed from start towards the bounds and then closed
+        with Illinois false position, falling back to bisection when the interpolation stalls
+        at a bracket end """
+    begin = time.monotonic()
+    v_low, v_high = window
+    i_low, i_high = bounds
+    if target is None:
+        target = (v_low + v_high) / 2
+    evaluated = []
+
+    def evaluate(current):
+        voltage = measure(current)
+        evaluated.append((current, voltage))
+        return voltage - target
+
+    def result(acquired):
+        current, voltage = min(evaluated, key=lambda point: abs(point[1] - target))
+        return OperatingPoint(current, voltage, acquired, len(evaluated), time.monotonic() - begin)
+
+    def in_window():
+        return v_low < evaluated[-1][1] < v_high
+
+    a = min(max(start, i_low), i_high)
+    fa = evaluate(a)
+    if in_window():
+        return result(True)
+
+    # assume a resistive load first, the voltage rises with current
+    bracket = None
+    for b in ((i_high, i_low) if fa < 0 else (i_low, i_high)):
+        if b == a or len(evaluated) >= max_iterations:
+            continue
+        fb = evaluate(b)
+        if in_window():
+            return result(True)
+        if (fa < 0) != (fb < 0):
+            bracket = (a, fa, b, fb)
+            break
+    if bracket is None:
+        return result(False)
+
+    a, fa, b, fb = bracket
+    side = 0
+    while len(evaluated) < max_iterations:
+        c = b - fb * (b - a) / (fb - fa)
+        if not min(a, b) < c < max(a, b):
+            c = (a + b) / 2
+        fc = evaluate(c)
+        if in_window():
+            return result(True)
+        if (fc < 0) == (fb < 0):
+            b, fb = c, fc
+            if side == -1:
+                fa /= 2
+            side = -1
+        else:
+            a, fa = b, fb
+            b, fb = c, fc
+            side = 1
+    return result(False)
@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+class ParallelIO():
+    """ Runs calls on independent instruments concurrently, each instrument keeps its
+        own command order through its lock so only calls on different devices overlap """
+    def __init__(self, max_workers : int, enabled : bool = True):
+        self._executor = None
+        if enabled and max_workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="instrument-io")
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def run(self, *calls):
+        """ Run all calls and return their results in order, the slowest call sets the duration """
+        if self._executor is None:
+            return [call() for call in calls]
+        futures = [self._executor.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,51 @@
+import numpy as np
+
+class MeasurementRecords():
+    """ Rows of one sweep in a preallocated structured array with a float64 field per result
+        column. A row is copied in place into a plain float view of the array, which doubles
+        its capacity when it fills """
+    __slots__ = ("dtype", "_data", "_values", "_count")
+
+    def __init__(self, columns : list, capacity : int = 1024):
+        self.dtype = np.dtype([(name, np.float64) for name in columns])
+        self._count = 0
+        self._allocate(max(int(capacity), 1))
+
+    def _allocate(self, capacity : int):
+        data = np.zeros(capacity, dtype=self.dtype)
+        data[:self._count] = self._data[:self._count] if self._count else data[:0]
+        self._data = data
+        self._values = data.view(np.float64).reshape(capacity, len(self.dtype.names))
+
+    def append(self, row):
+        if self._count == len(self._data):
+            self._allocate(2 * len(self._data))
+        self._values[self._count] = row
+        self._count += 1
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(self.dtype.names))
+        if self._count + len(rows) > len(self._data):
+            self._allocate(max(2 * len(self._data), self._count + len(rows)))
+        self._values[self._count:self._count + len(rows)] = rows
+        self._count += len(rows)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def columns(self) -> tuple:
+        return self.dtype.names
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    @property
+    def data(self) -> np.ndarray:
+        """ Structured array of the recorded rows, a view that the next rows may overwrite on growth """
+        return self._data[:self._count]
+
+    def as_array(self) -> np.ndarray:
+        """ Recorded rows as an (N, columns) float64 array view """
+        return self._values[:self._count]
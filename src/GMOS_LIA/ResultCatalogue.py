@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import sqlite3
+from collections import namedtuple
+from contextlib import closing
+import numpy as np
+from GMOS_LIA.ResultSinks import load_results, CSVResultSink, BinaryResultSink, _to_json
+
+CatalogueEntry = namedtuple('CatalogueEntry', ['path', 'tester', 'start_time', 'rows', 'columns', 'completed', 'duration'])
+
+_schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    path        TEXT UNIQUE NOT NULL,
+    tester      TEXT,
+    start_time  TEXT,
+    format      TEXT,
+    rows        INTEGER,
+    columns     TEXT,
+    config      TEXT,
+    completed   INTEGER,
+    duration    REAL,
+    mtime       REAL,
+    size        INTEGER,
+    indexed     REAL);
+CREATE TABLE IF NOT EXISTS axes (
+    run_id      INTEGER REFERENCES runs(id) ON DELETE CASCADE,
+    name        TEXT,
+    minimum     REAL,
+    maximum     REAL,
+    points      INTEGER);
+CREATE TABLE IF NOT EXISTS devices (
+    run_id      INTEGER REFERENCES runs(id) ON DELETE CASCADE,
+    name        TEXT,
+    idn         TEXT);
+CREATE TABLE IF NOT EXISTS columns (
+    run_id      INTEGER REFERENCES runs(id) ON DELETE CASCADE,
+    name        TEXT,
+    minimum     REAL,
+    maximum     REAL);
+CREATE INDEX IF NOT EXISTS runs_tester ON runs(tester, start_time);
+CREATE INDEX IF NOT EXISTS axes_name ON axes(name, minimum, maximum);
+CREATE INDEX IF NOT EXISTS devices_idn ON devices(idn);
+CREATE INDEX IF NOT EXISTS columns_name ON columns(name, minimum, maximum);
+"""
+
+def result_files(results_dir : str) -> list:
+    """ Result files under results_dir, given without extension like load_results takes them """
+    found = []
+    for root, _, files in os.walk(results_dir):
+        for name in files:
+            for extension in (CSVResultSink.extension, BinaryResultSink.extension):
+                if name.endswith(extension):
+                    found.append(os.path.join(root, name[:-len(extension)]))
+    return sorted(found)
+
+def _data_files(path : str) -> list:
+    if os.path.exists(f"{path}{BinaryResultSink.header_extension}"):
+        return [f"{path}{BinaryResultSink.extension}", f"{path}{BinaryResultSink.header_extension}"]
+    return [f"{path}{CSVResultSink.extension}"]
+
+class ResultCatalogue():
+    """ SQLite index of the result files of all runs, so runs can be selected by tester, sweep
+        axis range, device or column range without opening every file. Every call opens its
+        own connection, testers in several threads or bench processes can share one catalogue """
+    filename = "catalogue.sqlite"
+
+    def __init__(self, path : str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.executescript(_schema)
+
+    @classmethod
+    def in_directory(cls, results_dir : str) -> "ResultCatalogue":
+        return cls(os.path.join(results_dir, cls.filename))
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA foreign_keys = ON")
+        return connection
+
+    def record(self, path : str, header : dict = None, columns : list = None, completed : bool = True, duration : float = None):
+        """ Add or update the run of the result file path (without extension). header is the
+            result header of the sweep, without it the run is described from its directory
+            <tester>/<start time>/ and what an earlier record knew about it """
+        path = os.path.abspath(path)
+        data, file_columns = load_results(path)
+        data = np.atleast_2d(np.asarray(data, dtype=float))
+        rows = len(data) if data.size else 0
+        columns = list(columns or file_columns or [])
+        columns += [f"column {index}" for index in range(len(columns), data.shape[1] if rows else 0)]
+        data_files = _data_files(path)
+        mtime = max(os.path.getmtime(name) for name in data_files)
+        size = sum(os.path.getsize(name) for name in data_files)
+        result_format = "binary" if len(data_files) == 2 else "csv"
+        with closing(self._connect()) as connection, connection:
+            known = connection.execute("SELECT id, columns FROM runs WHERE path = ?", (path,)).fetchone()
+            if header is None and known is not None:
+                run_id, known_columns = known[0], json.loads(known[1])
+                if not file_columns:
+                    columns = known_columns + columns[len(known_columns):]
+                connection.execute("UPDATE runs SET rows = ?, columns = ?, mtime = ?, size = ?, indexed = ? WHERE id = ?",
+                                   (rows, json.dumps(columns), mtime, size, time.time(), run_id))
+            else:
+                if header is None:
+                    header = self._header_from_path(path)
+                connection.execute("DELETE FROM runs WHERE path = ?", (path,))
+                run_id = connection.execute(
+                    "INSERT INTO runs (path, tester, start_time, format, rows, columns, config, completed, duration, mtime, size, indexed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, header.get("tester"), header.get("start time"), result_format, rows, json.dumps(columns),
+                     json.dumps(header.get("config"), default=_to_json), None if completed is None else int(completed),
+                     duration, mtime, size, time.time())).lastrowid
+                connection.executemany("INSERT INTO axes VALUES (?, ?, ?, ?, ?)",
+                                       [(run_id, name, *axis) for name, axis in self._axes(header.get("sweep", {})).items()])
+                connection.executemany("INSERT INTO devices VALUES (?, ?, ?)",
+                                       [(run_id, name, idn) for name, idn in header.get("devices", {}).items()])
+            connection.execute("DELETE FROM columns WHERE run_id = ?", (run_id,))
+            if rows:
+                connection.executemany("INSERT INTO columns VALUES (?, ?, ?, ?)",
+                                       [(run_id, name, *self._range(data[:, index])) for index, name in enumerate(columns)])
+        return run_id
+
+    @staticmethod
+    def _header_from_path(path : str) -> dict:
+        run_dir = os.path.dirname(path)
+        return {"tester": os.path.basename(os.path.dirname(run_dir)), "start time": os.path.basename(run_dir)}
+
+    @staticmethod
+    def _range(values) -> tuple:
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return None, None
+        return float(values.min()), float(values.max())
+
+    @classmethod
+    def _axes(cls, sweep : dict) -> dict:
+        """ Range and number of points of every numeric sweep parameter """
+        axes = {}
+        for name, value in sweep.items():
+            try:
+                values = np.atleast_1d(np.asarray(value, dtype=float))
+            except (TypeError, ValueError):
+                continue
+            if values.size:
+                axes[name] = (*cls._range(values), int(values.size))
+        return axes
+
+    def index_tree(self, results_dir : str) -> dict:
+        """ Bring the catalogue up to date with the result files under results_dir, only new
+            and changed files are read. Runs whose files are gone are dropped """
+        results_dir = os.path.abspath(results_dir)
+        with closing(self._connect()) as connection:
+            known = {path: (mtime, size) for path, mtime, size in connection.execute("SELECT path, mtime, size FROM runs")
+                     if path.startswith(results_dir + os.sep)}
+        counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        for path in result_files(results_dir):
+            data_files = _data_files(path)
+            state = (max(os.path.getmtime(name) for name in data_files), sum(os.path.getsize(name) for name in data_files))
+            previous = known.pop(path, None)
+            if previous == state:
+                counts["unchanged"] += 1
+                continue
+            try:
+                self.record(path, completed=None)
+            except Exception as error:
+                print(f"[{self.__class__.__name__}] could not index {path}: {error}")
+                counts["failed"] += 1
+                continue
+            counts["added" if previous is None else "updated"] += 1
+        with closing(self._connect()) as connection, connection:
+            connection.executemany("DELETE FROM runs WHERE path = ?", [(path,) for path in known])
+        counts["removed"] = len(known)
+        return counts
+
+    def find(self, tester : str = None, device : str = None, since : str = None, until : str = None,
+             columns : dict = None, completed : bool = None, **axes) -> list:
+        """ Runs matching all given conditions, newest first. device matches a part of a
+            device IDN, since and until compare the "%Y%m%d-%H%M%S" start times. axes and
+            columns map a name to a value the run covered or a (low, high) range it overlaps,
+            e.g. find("ThreeTTester", heater_voltage=3, columns={"R": (1e-3, None)}) """
+        conditions, parameters = [], []
+        if tester is not None:
+            conditions.append("runs.tester = ?")
+            parameters.append(tester)
+        if since is not None:
+            conditions.append("runs.start_time >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("runs.start_time <= ?")
+            parameters.append(until)
+        if completed is not None:
+            conditions.append("runs.completed = ?")
+            parameters.append(int(completed))
+        if device is not None:
+            conditions.append("EXISTS (SELECT 1 FROM devices WHERE devices.run_id = runs.id AND devices.idn LIKE ?)")
+            parameters.append(f"%{device}%")
+        for table, ranges in (("axes", axes), ("columns", columns or {})):
+            for name, value in ranges.items():
+                low, high = value if isinstance(value, (tuple, list)) else (value, value)
+                conditions.append(f"EXISTS (SELECT 1 FROM {table} WHERE {table}.run_id = runs.id AND {table}.name = ? "
+                                  f"AND ({table}.maximum >= ? OR ? IS NULL) AND ({table}.minimum <= ? OR ? IS NULL))")
+                parameters += [name.replace("_", " ") if table == "axes" else name, low, low, high, high]
+        query = "SELECT path, tester, start_time, rows, columns, completed, duration FROM runs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY start_time DESC, path"
+        with closing(self._connect()) as connection:
+            return [CatalogueEntry(path, tester, start_time, rows, json.loads(columns),
+                                   None if completed is None else bool(completed), duration)
+                    for path, tester, start_time, rows, columns, completed, duration in connection.execute(query, parameters)]
+
+    def describe(self, path : str) -> dict:
+        """ Everything catalogued about the run of one result file """
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            run = connection.execute("SELECT * FROM runs WHERE path = ?", (os.path.abspath(path),)).fetchone()
+            if run is None:
+                raise KeyError(f"{path} is not catalogued")
+            description = dict(run)
+            description["columns"] = json.loads(run["columns"])
+            description["config"] = json.loads(run["config"]) if run["config"] else None
+            description["axes"] = {row["name"]: (row["minimum"], row["maximum"], row["points"])
+                                   for row in connection.execute("SELECT * FROM axes WHERE run_id = ?", (run["id"],))}
+            description["devices"] = {row["name"]: row["idn"]
+                                      for row in connection.execute("SELECT * FROM devices WHERE run_id = ?", (run["id"],))}
+            description["ranges"] = {row["name"]: (row["minimum"], row["maximum"])
+                                     for row in connection.execute("SELECT * FROM columns WHERE run_id = ?", (run["id"],))}
+            return description
+
+    @staticmethod
+    def load(entry):
+        """ (data, columns) of a CatalogueEntry or result path, CSV columns come from the catalogue """
+        if isinstance(entry, CatalogueEntry):
+            data, columns = load_results(entry.path)
+            return data, columns or entry.columns
+        return load_results(entry)
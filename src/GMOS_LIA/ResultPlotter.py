@@ -1,30 +1,186 @@
-import csv
-import matplotlib.pyplot as plt
+import os
+import time
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from GMOS_LIA.ResultSinks import load_results, CSVResultSink, BinaryResultSink
+
+_render_pool = None
+
+def _pyplot():
+    """ Import pyplot on the headless Agg backend, rendering only ever writes image files """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def _get_render_pool(max_workers : int = 1) -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _render_pool
+
+def downsample_minmax(X, Y, max_points : int):
+    """ Reduce a series to at most max_points while keeping the min/max envelope of Y,
+        every bucket of consecutive samples keeps its lowest and highest point in order """
+    n_points = len(Y)
+    if n_points <= max_points or max_points < 2:
+        return X, Y
+    buckets = max_points // 2
+    size = -(-n_points // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n_points] = Y
+    padded = padded.reshape(buckets, size)
+    valid = ~np.all(np.isnan(padded), axis=1)
+    offsets = np.arange(buckets)[valid] * size
+    padded = padded[valid]
+    keep = np.unique(np.concatenate([offsets + np.nanargmin(padded, axis=1),
+                                     offsets + np.nanargmax(padded, axis=1)]))
+    return X[keep], Y[keep]
+
+def render_2d(datafile : str, plot_settings : dict):
+    """ Render a result file to {datafile}.png """
+    plt = _pyplot()
+    data, _ = load_results(datafile)
+    X = np.asarray(data[:, plot_settings["X column index"]])
+    Y = np.asarray(data[:, plot_settings["Y column index"]])
+    X, Y = downsample_minmax(X, Y, plot_settings.get("Max points", 2000))
+    fig, ax = plt.subplots()
+    ax.plot(X, Y, marker='o')
+    ax.set_yscale(plot_settings["Y scale"])
+    ax.set_xscale(plot_settings["X scale"])
+    plt.title(plot_settings["Plot title"])
+    plt.xlabel(plot_settings["X label"])
+    plt.ylabel(plot_settings["Y label"])
+    plt.grid(True)
+    plt.savefig(f"{datafile}.png")
+    plt.close(fig)
+    return f"{datafile}.png"
+
+def _live_render_loop(rows : multiprocessing.Queue, datafile : str, plot_settings : dict, refresh_rate : float):
+    """ Append incoming (x, y) batches to the line and redraw at most refresh_rate times a
+        second, frames are skipped when data arrives faster than that but no rows are lost """
+    import matplotlib.pyplot as plt
+    headless = plt.get_backend().lower() == "agg"
+    fig, ax = plt.subplots()
+    line, = ax.plot([], [], marker='o')
+    ax.set_yscale(plot_settings["Y scale"])
+    ax.set_xscale(plot_settings["X scale"])
+    ax.set_title(f"{plot_settings['Plot title']} (live)")
+    ax.set_xlabel(plot_settings["X label"])
+    ax.set_ylabel(plot_settings["Y label"])
+    ax.grid(True)
+    if not headless:
+        plt.show(block=False)
+    data = np.empty((1024, 2))
+    length = 0
+    next_frame = time.monotonic()
+    done = dirty = False
+    while not done:
+        try:
+            batch = rows.get(timeout=max(next_frame - time.monotonic(), 1e-3))
+            while True:
+                if batch is None:
+                    done = True
+                    break
+                if length + len(batch) > len(data):
+                    data = np.concatenate([data, np.empty((max(len(data), len(batch)), 2))])
+                data[length:length + len(batch)] = batch
+                length += len(batch)
+                dirty = True
+                batch = rows.get_nowait()
+        except queue.Empty:
+            pass
+        if dirty and (done or time.monotonic() >= next_frame):
+            line.set_data(*downsample_minmax(data[:length, 0], data[:length, 1], plot_settings.get("Max points", 2000)))
+            ax.relim()
+            ax.autoscale_view()
+            if headless:
+                fig.savefig(f"{datafile}_live.png")
+            else:
+                fig.canvas.draw_idle()
+                plt.pause(1e-3)
+            next_frame = time.monotonic() + 1 / refresh_rate
+            dirty = False
+    plt.close(fig)
+
+class LivePlotter():
+    """ Streams recorded points to a separate render process through a bounded queue.
+        A full queue never blocks the acquisition, the points wait here and go with the next batch """
+    def __init__(self, datafile : str, plot_settings : dict, max_batches : int = 64):
+        context = multiprocessing.get_context("spawn")
+        self._columns = (plot_settings["X column index"], plot_settings["Y column index"])
+        self._rows = context.Queue(max_batches)
+        self._pending = []
+        self._process = context.Process(
+                        target=_live_render_loop,
+                        args=(self._rows, datafile, plot_settings, plot_settings.get("Live refresh rate", 2)),
+                        daemon=True)
+        self._process.start()
+
+    def push(self, measurment):
+        self._pending.append([float(measurment[column]) for column in self._columns])
+        try:
+            self._rows.put_nowait(self._pending)
+            self._pending = []
+        except queue.Full:
+            pass
+
+    def close(self, timeout : float = 10):
+        if self._pending:
+            self._rows.put(self._pending, timeout=timeout)
+            self._pending = []
+        self._rows.put(None, timeout=timeout)
+        self._process.join(timeout)
 
 class Plotter():
     def __init__(self, results_dir : str, plot_settings : dict):
         self._results_dir = results_dir
         self._plot_settings = plot_settings
-        
+
     def plot_2d(self, datafile: str):
-        with open(f"{datafile}.csv", 'r') as file:
-            reader = csv.reader(file)
-            Xcol_idx = self._plot_settings["X column index"]
-            Ycol_idx = self._plot_settings["Y column index"]
-            data = []
-            for row in reader:
-                y_data = float(row[Ycol_idx])
-                x_data = float(row[Xcol_idx])
-                data.append((y_data,x_data))
-                
-        [Y, X] = list(zip(*data))
-        fig, ax = plt.subplots()
-        ax.plot(X, Y, marker='o')
-        ax.set_yscale(self._plot_settings["Y scale"])
-        ax.set_xscale(self._plot_settings["X scale"])
-        plt.title(self._plot_settings["Plot title"])
-        plt.xlabel(self._plot_settings["X label"])
-        plt.ylabel(self._plot_settings["Y label"])
-        plt.grid(True)
-        plt.savefig(f"{datafile}.png")
-        plt.close()
\ No newline at end of file
+        return render_2d(datafile, self._plot_settings)
+
+    def live(self, datafile: str) -> LivePlotter:
+        return LivePlotter(datafile, self._plot_settings)
+
+    def plot_2d_async(self, datafile: str):
+        """ Render in a worker process, returns a Future of the image path """
+        return _get_render_pool().submit(render_2d, datafile, self._plot_settings)
+
+    @staticmethod
+    def find_stale_results(results_dir : str) -> list:
+        """ Result files under results_dir without an image newer than their data """
+        stale = []
+        for root, _, files in os.walk(results_dir):
+            for name in files:
+                if name.endswith(CSVResultSink.extension):
+                    datafile = os.path.join(root, name[:-len(CSVResultSink.extension)])
+                    data_paths = [f"{datafile}{CSVResultSink.extension}"]
+                elif name.endswith(BinaryResultSink.extension):
+                    datafile = os.path.join(root, name[:-len(BinaryResultSink.extension)])
+                    data_paths = [f"{datafile}{BinaryResultSink.extension}", f"{datafile}{BinaryResultSink.header_extension}"]
+                else:
+                    continue
+                image = f"{datafile}.png"
+                if not os.path.exists(image) or os.path.getmtime(image) < max(map(os.path.getmtime, data_paths)):
+                    stale.append(datafile)
+        return sorted(stale)
+
+    @classmethod
+    def replot_tree(cls, results_dir : str, plot_settings : dict, max_workers : int = None) -> list:
+        """ Re-plot every result file under results_dir whose data changed since its image
+            was rendered, in parallel worker processes """
+        stale = cls.find_stale_results(results_dir)
+        if not stale:
+            return []
+        images = []
+        with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {datafile: pool.submit(render_2d, datafile, plot_settings) for datafile in stale}
+            for datafile, future in futures.items():
+                try:
+                    images.append(future.result())
+                except Exception as error:
+                    print(f"[Plotter] could not plot {datafile}: {error}")
+        return images
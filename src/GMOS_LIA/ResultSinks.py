@@ -0,0 +1,210 @@
+import os
+import csv
+import json
+import time
+import numpy as np
+
+class ResultSink():
+    """ Destination of the measured rows of one result file """
+    extension = None
+
+    def __init__(self, path : str, columns : list, header : dict, settings : dict, append : bool = False):
+        """ With append the rows go after the existing rows of the file, the header is kept """
+        self._path = path
+        self._columns = list(columns)
+        self._append = append
+        self.rows = 0
+        self._flush_interval = settings.get("flush interval", 5)
+        self._fsync_interval = settings.get("fsync interval", 60)
+        self._last_flush = self._last_fsync = time.monotonic()
+
+    @property
+    def filename(self) -> str:
+        return f"{self._path}{self.extension}"
+
+    def write_row(self, row) -> bool:
+        """ Store one row, returns True when the row has been flushed to the file """
+        raise NotImplementedError
+
+    def _flush_due(self) -> bool:
+        return time.monotonic() - self._last_flush >= self._flush_interval
+
+    def flush(self):
+        self._write_buffered()
+        self._file.flush()
+        now = time.monotonic()
+        self._last_flush = now
+        if now - self._last_fsync >= self._fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _write_buffered(self):
+        pass
+
+    def close(self):
+        self._write_buffered()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class CSVResultSink(ResultSink):
+    """ Text rows readable by any tool, kept for compatibility """
+    extension = ".csv"
+
+    def __init__(self, path, columns, header, settings, append=False):
+        super().__init__(path, columns, header, settings, append)
+        self._file = open(self.filename, 'a' if append else 'w', newline='')
+        self._writer = csv.writer(self._file)
+
+    def write_row(self, row) -> bool:
+        self._writer.writerow(row)
+        self.rows += 1
+        if self._flush_due():
+            self.flush()
+            return True
+        return False
+
+class BinaryResultSink(ResultSink):
+    """ Append only raw float64 rows with a JSON header holding column names, sweep
+        configuration and device identities. Rows are buffered in chunks and flushed
+        when a chunk fills or the flush interval passes """
+    extension = ".f64"
+    header_extension = ".json"
+
+    def __init__(self, path, columns, header, settings, append=False):
+        super().__init__(path, columns, header, settings, append)
+        self._buffer = np.empty((settings.get("chunk rows", 1024), len(self._columns)), dtype='<f8')
+        self._buffered = 0
+        header_file = f"{self._path}{self.header_extension}"
+        if not (append and os.path.exists(header_file)):
+            header = dict(header, columns=self._columns, dtype='<f8')
+            with open(header_file, 'w') as file:
+                json.dump(header, file, indent=4, default=_to_json)
+        self._file = open(self.filename, 'ab' if append else 'wb')
+
+    def write_row(self, row) -> bool:
+        if len(row) != len(self._columns):
+            raise ValueError(f"Row of {len(row)} values does not match columns {self._columns}")
+        self._buffer[self._buffered] = row
+        self._buffered += 1
+        self.rows += 1
+        if self._buffered == len(self._buffer) or self._flush_due():
+            self.flush()
+            return True
+        return False
+
+    def _write_buffered(self):
+        if self._buffered:
+            self._file.write(self._buffer[:self._buffered].tobytes())
+            self._buffered = 0
+
+result_sinks = {
+    "csv"    : CSVResultSink,
+    "binary" : BinaryResultSink,
+}
+
+def open_result_sink(settings : dict, path : str, columns : list, header : dict, append : bool = False) -> ResultSink:
+    result_format = settings.get("format", "csv")
+    if result_format not in result_sinks:
+        raise Exception(f"Invalid result format {result_format}")
+    return result_sinks[result_format](path, columns, header, settings, append)
+
+class RotatingResultSink():
+    """ Splits an endless acquisition into numbered result files {path}_0000, {path}_0001 ...
+        A new file starts once the current one holds max_bytes or is max_seconds old """
+    def __init__(self, settings : dict, path : str, columns : list, header : dict,
+                 max_bytes : float = None, max_seconds : float = None):
+        self._settings = settings
+        self._path = path
+        self._columns = columns
+        self._header = header
+        self._max_bytes = max_bytes
+        self._max_seconds = max_seconds
+        self._part = -1
+        self._sink = None
+        self.filenames = []
+        self._rotate()
+
+    @property
+    def filename(self) -> str:
+        return self._sink.filename
+
+    def _rotate(self):
+        if self._sink is not None:
+            self._sink.close()
+        self._part += 1
+        self._sink = open_result_sink(self._settings, f"{self._path}_{self._part:04d}",
+                                      self._columns, dict(self._header, part=self._part))
+        self._opened = time.monotonic()
+        self.filenames.append(self._sink.filename)
+
+    def write_row(self, row) -> bool:
+        flushed = self._sink.write_row(row)
+        if ((self._max_seconds and time.monotonic() - self._opened >= self._max_seconds) or
+            (flushed and self._max_bytes and os.path.getsize(self._sink.filename) >= self._max_bytes)):
+            self._rotate()
+            return True
+        return flushed
+
+    def flush(self):
+        self._sink.flush()
+
+    def close(self):
+        self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+def truncate_results(path : str, rows : int):
+    """ Cut a result file given without extension back to its first rows rows, drops the
+        rows written after the last checkpoint of an interrupted sweep """
+    header_file = f"{path}{BinaryResultSink.header_extension}"
+    if os.path.exists(header_file):
+        with open(header_file, 'r') as file:
+            columns = json.load(file)["columns"]
+        data_file = f"{path}{BinaryResultSink.extension}"
+        if os.path.exists(data_file):
+            os.truncate(data_file, min(os.path.getsize(data_file), rows * 8 * len(columns)))
+        return
+    data_file = f"{path}{CSVResultSink.extension}"
+    if not os.path.exists(data_file):
+        return
+    with open(data_file, 'r', newline='') as file:
+        lines = file.readlines()[:rows]
+    if lines and not lines[-1].endswith("\n"):
+        lines = lines[:-1]
+    with open(data_file, 'w', newline='') as file:
+        file.writelines(lines)
+
+def load_results(path : str):
+    """ Load a result file given without extension, returns (data, columns).
+        Binary results are memory mapped, columns is None for CSV results """
+    header_file = f"{path}{BinaryResultSink.header_extension}"
+    if os.path.exists(header_file):
+        with open(header_file, 'r') as file:
+            header = json.load(file)
+        columns = header["columns"]
+        data_file = f"{path}{BinaryResultSink.extension}"
+        row_bytes = 8 * len(columns)
+        rows = os.path.getsize(data_file) // row_bytes
+        if rows == 0:
+            return np.empty((0, len(columns))), columns
+        data = np.memmap(data_file, dtype=header["dtype"], mode='r', shape=(rows, len(columns)))
+        return data, columns
+    return np.loadtxt(f"{path}{CSVResultSink.extension}", delimiter=',', ndmin=2), None
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,95 @@
+import time
+import asyncio
+from collections import deque
+import numpy as np
+
+class Settler():
+    """ Waits for a reading to settle instead of sleeping for a fixed worst case time. A reading
+        is settled once it stayed within tolerance over the last window seconds, for the slope
+        criterion the tolerance is a relative change per second """
+    criteria = ("fixed", "relative", "slope", "time constants")
+
+    def __init__(self, settings : dict):
+        self._criterion = settings.get("criterion", "fixed")
+        if self._criterion not in self.criteria:
+            raise Exception(f"Invalid settling criterion {self._criterion}")
+        self._tolerance = settings.get("tolerance", 1e-3)
+        self._abs_tolerance = settings.get("absolute tolerance", 0)
+        self._poll_interval = settings.get("poll interval", 20e-3)
+        self._window = settings.get("window", 60e-3)
+        self._time_constants = settings.get("time constants", 5)
+
+    @property
+    def criterion(self) -> str:
+        return self._criterion
+
+    def _settling(self, timeout: float, time_constant: float = None):
+        """ Settling steps shared by settle() and asettle(). Yields the seconds to wait before
+            the next reading, is sent that reading and returns the last reading and the time
+            it took to settle """
+        start = time.monotonic()
+        if self._criterion in ("fixed", "time constants"):
+            wait = timeout
+            if self._criterion == "time constants" and time_constant is not None:
+                wait = min(self._time_constants * time_constant, timeout)
+            reading = yield wait
+            return reading, time.monotonic() - start
+
+        deadline = start + timeout
+        times = deque()
+        readings = deque()
+        wait = 0
+        while True:
+            reading = yield wait
+            now = time.monotonic()
+            times.append(now)
+            readings.append(np.asarray(reading, dtype=float))
+            if now >= deadline or self._is_settled(times, readings):
+                return reading, now - start
+            wait = min(self._poll_interval, deadline - now)
+
+    def settle(self, read, timeout: float, time_constant: float = None):
+        """ Poll read() until the stability criterion is met or timeout passes,
+            returns the last reading and the time it took to settle """
+        steps = self._settling(timeout, time_constant)
+        wait = next(steps)
+        while True:
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                wait = steps.send(read())
+            except StopIteration as settled:
+                return settled.value
+
+    async def asettle(self, read, timeout: float, time_constant: float = None):
+        """ settle() for a coroutine read(), waits with asyncio.sleep so the event loop
+            keeps driving other setups meanwhile """
+        steps = self._settling(timeout, time_constant)
+        wait = next(steps)
+        while True:
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                wait = steps.send(await read())
+            except StopIteration as settled:
+                return settled.value
+
+    def _is_settled(self, times, readings) -> bool:
+        """ Drop the readings older than needed to span the window, then judge the span """
+        while len(times) > 2 and times[-1] - times[1] >= self._window:
+            times.popleft()
+            readings.popleft()
+        return len(times) > 1 and times[-1] - times[0] >= self._window and self._is_stable(times, readings)
+
+    def _is_stable(self, times, readings) -> bool:
+        values = np.array(readings)
+        scale = self._tolerance * np.abs(values.mean(axis=0)) + self._abs_tolerance
+        if self._criterion == "relative":
+            change = np.ptp(values, axis=0)
+        else:
+            t = np.array(times) - np.mean(times)
+            t_var = np.dot(t, t)
+            if t_var == 0:
+                return False
+            change = np.abs(t @ (values - values.mean(axis=0)) / t_var)
+        return bool(np.all(change <= scale))
@@ -0,0 +1,428 @@
+import math
+import time
+import threading
+import numpy as np
+
+_sleep = time.sleep
+
+class GMOSModel():
+    """ Simulated GMOS sensor shared by the instruments of one bench. The heater temperature
+        follows the heater power with a first order lag, the drain channel resistance falls
+        with temperature and the LIA sees the gate transconductance, peaked around a
+        temperature dependent threshold, through its low pass filter """
+    def __init__(self, settings : dict = None, seed : int = None):
+        settings = settings or {}
+        self.ambient = 25.0
+        self._heater_resistance = settings.get("heater resistance", 100.0)
+        self._heater_tcr = settings.get("heater tcr", 3e-3)
+        self._thermal_resistance = settings.get("thermal resistance", 500.0)
+        self._heater_tau = settings.get("heater time constant", 0.3)
+        self._channel_resistance = settings.get("channel resistance", 400e3)
+        self._channel_temperature_scale = settings.get("channel temperature scale", 40.0)
+        self._threshold = settings.get("threshold", 0.95)
+        self._threshold_tc = settings.get("threshold tc", -2e-3)
+        self._threshold_slope = settings.get("threshold slope", 0.02)
+        self._lia_gain = settings.get("lia gain", 1.0)
+        self._lia_phase = math.radians(settings.get("lia phase", 30.0))
+        self.noise = settings.get("noise", 1e-3)
+        self._lia_noise = settings.get("lia noise", 1e-7)
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.RLock()
+        self.reset_lia()
+        self.heater_power = 0.0
+        self.temperature = self.ambient
+        self._lia_state = np.zeros(2)
+        self._time = time.monotonic()
+
+    def reset_lia(self):
+        self.lia_offset = 0.0
+        self.lia_amplitude = 0.0
+        self.lia_frequency = 1e3
+        self.lia_time_constant = 10e-3
+        self.phase_offset = 0.0
+
+    def heater_resistance(self) -> float:
+        return self._heater_resistance * (1 + self._heater_tcr * (self.temperature - self.ambient))
+
+    def channel_resistance(self) -> float:
+        return self._channel_resistance * math.exp(-(self.temperature - self.ambient) / self._channel_temperature_scale)
+
+    def _lia_target(self) -> np.ndarray:
+        threshold = self._threshold + self._threshold_tc * (self.temperature - self.ambient)
+        R = self.lia_amplitude * self._lia_gain / math.cosh((self.lia_offset - threshold) / self._threshold_slope) ** 2
+        phase = self._lia_phase - self.phase_offset
+        return np.array([R * math.cos(phase), R * math.sin(phase)])
+
+    def advance(self):
+        """ Integrate the dynamics up to now, called on every instrument transaction """
+        with self.lock:
+            now = time.monotonic()
+            dt = now - self._time
+            self._time = now
+            if dt <= 0:
+                return
+            target = self.ambient + self._thermal_resistance * self.heater_power
+            self.temperature += (target - self.temperature) * (1 - math.exp(-dt / self._heater_tau))
+            self._lia_state += (self._lia_target() - self._lia_state) * (1 - math.exp(-dt / self.lia_time_constant))
+
+    def lia_reading(self) -> np.ndarray:
+        """ [X, Y, R, theta] with relative noise and an input noise shrinking with the filter time constant """
+        with self.lock:
+            self.advance()
+            sigma = self._lia_noise / math.sqrt(self.lia_time_constant)
+            X, Y = self._lia_state * (1 + self.noise * self.rng.standard_normal()) + sigma * self.rng.standard_normal(2)
+            return np.array([X, Y, math.hypot(X, Y), math.degrees(math.atan2(Y, X))])
+
+    def auto_phase(self):
+        with self.lock:
+            self.advance()
+            self.phase_offset += math.atan2(self._lia_state[1], self._lia_state[0])
+
+    def measure(self, value : float) -> float:
+        return value * (1 + self.noise * self.rng.standard_normal())
+
+class SimulatedInstrument():
+    """ Command interpreter of one simulated instrument """
+    model_name = None
+
+    def __init__(self, model : GMOSModel, address : str):
+        self.model = model
+        self.address = address
+        self.busy_time = 0.0
+        self.reset()
+
+    def reset(self):
+        pass
+
+    def handle(self, command : str):
+        """ Execute one command, returns the response of a query or None """
+        header, _, argument = command.partition(" ")
+        header = header.upper()
+        if header == "*IDN?":
+            return f"Simulated,{self.model_name},{self.address},1.0"
+        if header == "*RST":
+            self.reset()
+            return None
+        if header in ("*CLS", "*WAI"):
+            return None
+        if header == "*OPC?":
+            return "1"
+        handler = getattr(self, "_" + header.replace(":", "_").replace("?", "_query").replace("*", ""), None)
+        if handler is None:
+            if header.endswith("?"):
+                raise Exception(f"{self.model_name} at {self.address} does not understand {command}")
+            self.settings[header] = argument.strip()
+            return None
+        return handler(argument.strip())
+
+class SimulatedSMU(SimulatedInstrument):
+    """ Keysight B2961A subset, role "heater" drives the heater resistor and role "drain" the sensor channel """
+    model_name = "B2961A"
+
+    def __init__(self, model, address, role):
+        self.role = role
+        super().__init__(model, address)
+
+    def reset(self):
+        self.settings = {"FUNC:MODE": "VOLT", "FORM:DATA": "ASC", "TRIG:COUN": "1", "TRIG:ACQ:DEL": "0",
+                         "SENS:VOLT:APER": "1e-4", "SOUR:VOLT:MODE": "FIX", "SOUR:CURR:MODE": "FIX"}
+        self.voltage = 0.0
+        self.current = 0.0
+        self.output = False
+        self.voltage_compliance = 2.0
+        self.current_compliance = 0.1
+        self.list = []
+        self.tripped = False
+        self.sweep_results = np.empty(0)
+        self._update_heater()
+
+    @property
+    def binary(self) -> bool:
+        return self.settings["FORM:DATA"].startswith("REAL")
+
+    def _load(self) -> float:
+        return self.model.heater_resistance() if self.role == "heater" else self.model.channel_resistance()
+
+    def _update_heater(self):
+        if self.role != "heater":
+            return
+        with self.model.lock:
+            self.model.advance()
+            if not self.output:
+                self.model.heater_power = 0.0
+            elif self.settings["FUNC:MODE"] == "VOLT":
+                current = min(abs(self.voltage) / self.model.heater_resistance(), self.current_compliance)
+                self.model.heater_power = current * abs(self.voltage)
+            else:
+                voltage = min(abs(self.current) * self.model.heater_resistance(), self.voltage_compliance)
+                self.model.heater_power = voltage * abs(self.current)
+
+    def _FUNC_MODE(self, argument):
+        self.settings["FUNC:MODE"] = argument
+        self._update_heater()
+
+    def _SOUR_VOLT(self, argument):
+        self.voltage = float(argument)
+        self._update_heater()
+
+    def _SOUR_CURR(self, argument):
+        self.current = float(argument)
+        self._update_heater()
+
+    def _OUTP(self, argument):
+        self.output = argument in ("1", "ON")
+        self._update_heater()
+
+    def _SENS_VOLT_PROT(self, argument):
+        self.voltage_compliance = float(argument)
+        self._update_heater()
+
+    def _SENS_CURR_PROT(self, argument):
+        self.current_compliance = float(argument)
+        self._update_heater()
+
+    def _SOUR_LIST_VOLT(self, argument):
+        self.list = [float(value) for value in argument.split(",")]
+
+    def _SOUR_LIST_CURR(self, argument):
+        self.list = [float(value) for value in argument.split(",")]
+
+    def _SENS_VOLT_PROT_TRIP_query(self, argument):
+        return "1" if self.tripped and self.settings["FUNC:MODE"] == "CURR" else "0"
+
+    def _SENS_CURR_PROT_TRIP_query(self, argument):
+        return "1" if self.tripped and self.settings["FUNC:MODE"] == "VOLT" else "0"
+
+    def reading(self, level : float = None) -> list:
+        """ [V, I] at the output, at level instead of the fixed source value during a list
+            sweep, with compliance clipping and noise """
+        self.model.advance()
+        if not self.output:
+            return [0.0, 0.0]
+        load = self._load()
+        if self.settings["FUNC:MODE"] == "VOLT":
+            voltage = self.voltage if level is None else level
+            current = voltage / load
+            self.tripped = abs(current) > self.current_compliance
+            if self.tripped:
+                current = math.copysign(self.current_compliance, current)
+                voltage = current * load
+        else:
+            current = self.current if level is None else level
+            voltage = current * load
+            self.tripped = abs(voltage) > self.voltage_compliance
+            if self.tripped:
+                voltage = math.copysign(self.voltage_compliance, voltage)
+                current = voltage / load
+        return [self.model.measure(voltage), self.model.measure(current)]
+
+    def _numeric(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        return values if self.binary else ",".join(f"{value:.9g}" for value in values)
+
+    def _auto_on(self):
+        """ Like the B2961A default, a measurement turns the output on """
+        if not self.output and self.settings.get("OUTP:ON:AUTO", "1") in ("1", "ON"):
+            self._OUTP("1")
+
+    def _MEAS_query(self, argument):
+        self._auto_on()
+        self.busy_time += float(self.settings["SENS:VOLT:APER"])
+        return self._numeric(self.reading())
+
+    def _INIT(self, argument):
+        self._auto_on()
+        points = int(float(self.settings["TRIG:COUN"]))
+        step = float(self.settings["TRIG:ACQ:DEL"]) + float(self.settings["SENS:VOLT:APER"])
+        if self.settings.get("TRIG:SOUR") == "TIM":
+            step = max(step, float(self.settings["TRIG:TIM"]))
+        mode = self.settings["FUNC:MODE"]
+        if self.settings.get(f"SOUR:{mode}:MODE") == "LIST":
+            levels = self.list[:points]
+        else:
+            levels = [None] * points
+        self.busy_time += step * points
+        self.sweep_results = np.array([self.reading(level) for level in levels])
+
+    def _FETC_ARR_query(self, argument):
+        return self._numeric(self.sweep_results)
+
+class SimulatedLIA(SimulatedInstrument):
+    """ SR860 subset driving the gate of the simulated sensor """
+    model_name = "SR860"
+    max_capture_rate = 1.25e6
+
+    def reset(self):
+        self.settings = {}
+        self.model.reset_lia()
+        self.time_constant_index = 8
+        self.capture_config = 3
+        self.capture_kbytes = 1
+        self.capture_divider = 0
+        self.capture_start = None
+
+    def _FREQ(self, argument):
+        self.model.advance()
+        self.model.lia_frequency = float(argument)
+
+    def _SLVL(self, argument):
+        self.model.advance()
+        self.model.lia_amplitude = float(argument)
+
+    def _SOFF(self, argument):
+        self.model.advance()
+        self.model.lia_offset = float(argument)
+
+    def _OFLT(self, argument):
+        self.time_constant_index = int(argument)
+        self.model.lia_time_constant = (1, 3)[self.time_constant_index % 2] * 10.0 ** (self.time_constant_index // 2 - 6)
+
+    def _OFLT_query(self, argument):
+        return str(self.time_constant_index)
+
+    def _APHS(self, argument):
+        self.model.auto_phase()
+
+    def _SNAPD_query(self, argument):
+        return ", ".join(f"{value:.9g}" for value in self.model.lia_reading())
+
+    def _CAPTURERATEMAX_query(self, argument):
+        return f"{self.max_capture_rate:g}"
+
+    def _CAPTURECFG(self, argument):
+        self.capture_config = int(argument)
+
+    def _CAPTURELEN(self, argument):
+        self.capture_kbytes = int(argument)
+
+    def _CAPTURERATE(self, argument):
+        self.capture_divider = int(argument)
+
+    def _CAPTURESTART(self, argument):
+        self.capture_start = time.monotonic()
+
+    def _CAPTURESTOP(self, argument):
+        pass
+
+    def _capture_values(self) -> int:
+        return {0: 1, 1: 2, 2: 2, 3: 4}[self.capture_config]
+
+    def _CAPTUREBYTES_query(self, argument):
+        if self.capture_start is None:
+            return "0"
+        rate = self.max_capture_rate / 2 ** self.capture_divider
+        captured = int((time.monotonic() - self.capture_start) * rate) * self._capture_values() * 4
+        return str(min(captured, self.capture_kbytes * 1024))
+
+    def _CAPTUREGET_query(self, argument):
+        kbytes = int(argument.split(",")[1])
+        values = self._capture_values()
+        samples = kbytes * 1024 // (4 * values)
+        columns = {0: [0], 1: [0, 1], 2: [2, 3], 3: [0, 1, 2, 3]}[self.capture_config]
+        readings = np.array([self.model.lia_reading()[columns] for _ in range(samples)], dtype=np.float32)
+        return readings.ravel()
+
+class SimulatedSession():
+    """ Stands in for an open pyvisa resource. Batched messages are split on ';' like the
+        instruments do and every message pays the bus latency and transfer time """
+    def __init__(self, manager, instrument : SimulatedInstrument):
+        self._manager = manager
+        self.instrument = instrument
+        self.timeout = 2000
+        self.session = id(self)
+
+    def _execute(self, message : str) -> list:
+        with self.instrument.model.lock:
+            self.instrument.busy_time = 0.0
+            responses = [self.instrument.handle(command.strip().lstrip(":"))
+                         for command in message.split(";") if command.strip()]
+            busy_time = self.instrument.busy_time
+        return [response for response in responses if response is not None], busy_time
+
+    def write(self, message : str):
+        start = time.monotonic()
+        _, busy_time = self._execute(message)
+        self._manager.transaction(start, len(message) + 1, busy_time)
+
+    def query(self, message : str) -> str:
+        start = time.monotonic()
+        responses, busy_time = self._execute(message)
+        response = ";".join(str(response) for response in responses) + "\n"
+        self._manager.transaction(start, len(message) + 1 + len(response), busy_time)
+        return response
+
+    def query_binary_values(self, message : str, datatype='f', is_big_endian=False, container=list, **kwargs):
+        start = time.monotonic()
+        responses, busy_time = self._execute(message)
+        values = np.asarray(responses[-1], dtype='d' if datatype == 'd' else 'f')
+        self._manager.transaction(start, len(message) + 1 + values.nbytes, busy_time)
+        return container(values)
+
+    def close(self):
+        self._manager.close_session(self)
+
+class SimulatedResourceManager():
+    """ In process replacement of a pyvisa ResourceManager for one simulated bench.
+        devices maps VISA address to "LIA", "heater SMU" or "drain SMU". Every transaction
+        takes latency plus the message bytes at byte time on the bus, the busy time of the
+        instrument (apertures, triggered sweeps) is added on top """
+    def __init__(self, devices : dict, settings : dict = None, seed : int = None):
+        settings = settings or {}
+        self.model = GMOSModel(settings, seed)
+        self._devices = devices
+        self._latency = settings.get("latency", 2e-3)
+        self._byte_time = settings.get("byte time", 1e-6)
+        self._sessions = []
+        self._lock = threading.Lock()
+        self.reset_statistics()
+
+    @classmethod
+    def from_setup(cls, setup : dict, connected_devices : str = None, settings : dict = None, seed : int = None):
+        """ Simulate the devices of a setup.json device section, roles follow the device names """
+        section = setup[connected_devices or setup["connected devices"]]
+        devices = {}
+        for name, address in section.items():
+            if "LIA" in name:
+                devices[address] = "LIA"
+            elif "Drain" in name:
+                devices[address] = "drain SMU"
+            else:
+                devices[address] = "heater SMU"
+        return cls(devices, settings, seed)
+
+    def reset_statistics(self):
+        with self._lock:
+            self.transactions = 0
+            self.bytes = 0
+            self.io_time = 0.0
+
+    def transaction(self, start : float, n_bytes : int, busy_time : float):
+        remaining = start + self._latency + n_bytes * self._byte_time + busy_time - time.monotonic()
+        if remaining > 0:
+            _sleep(remaining)
+        with self._lock:
+            self.transactions += 1
+            self.bytes += n_bytes
+            self.io_time += time.monotonic() - start
+
+    def open_resource(self, address : str):
+        kind = self._devices.get(address)
+        if kind is None:
+            raise Exception(f"No simulated device at {address}")
+        if kind == "LIA":
+            instrument = SimulatedLIA(self.model, address)
+        else:
+            instrument = SimulatedSMU(self.model, address, kind.split()[0])
+        session = SimulatedSession(self, instrument)
+        self._sessions.append(session)
+        return session
+
+    def close_session(self, session : SimulatedSession):
+        if session in self._sessions:
+            self._sessions.remove(session)
+
+    def list_resources(self) -> tuple:
+        return tuple(self._devices)
+
+    def close(self):
+        self._sessions.clear()
@@ -0,0 +1,84 @@
+import math
+import numpy as np
+from GMOS_LIA.LabDevices import LIA_measurment, SMU
+
+def _hann(n_samples : int) -> np.ndarray:
+    """ Periodic Hann window, a tone on a capture bin leaks only into its two neighbours """
+    return 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_samples) / n_samples)
+
+windows = {"rect": np.ones, "hann": _hann}
+
+def coherent_frequencies(frequencies, sample_rate : float, n_samples : int, spacing : int = 2) -> np.ndarray:
+    """ Snap frequencies to whole numbers of cycles in the capture so the tones do not leak into
+        each other, spacing is the least number of capture bins between two tones """
+    resolution = sample_rate / n_samples
+    bins = np.maximum(np.rint(np.asarray(frequencies, dtype=float) / resolution), 1)
+    if np.any(np.diff(np.sort(bins)) < spacing):
+        raise Exception(f"Frequencies closer than {spacing} x {resolution:g} Hz, capture more samples")
+    if bins.max() >= n_samples / 2:
+        raise Exception(f"Frequencies above the Nyquist frequency {sample_rate / 2:g} Hz, raise the sample rate")
+    return bins * resolution
+
+def schroeder_phases(n_tones : int) -> np.ndarray:
+    """ Tone phases keeping the crest factor of a multitone low """
+    k = np.arange(1, n_tones + 1)
+    return -np.pi * k * (k - 1) / n_tones
+
+def multitone(frequencies, amplitude, sample_rate : float, n_samples : int, phases = None, offset : float = 0) -> np.ndarray:
+    """ offset plus sines of amplitude (one or one per tone) sampled n_samples times at sample_rate """
+    frequencies = np.asarray(frequencies, dtype=float)
+    phases = schroeder_phases(len(frequencies)) if phases is None else np.asarray(phases, dtype=float)
+    amplitude = np.broadcast_to(np.asarray(amplitude, dtype=float), frequencies.shape)
+    t = np.arange(n_samples) / sample_rate
+    return offset + amplitude @ np.sin(2 * np.pi * frequencies[:, None] * t + phases[:, None])
+
+def phasors(signal, frequencies, sample_rate : float, window : str = "hann") -> np.ndarray:
+    """ Complex peak amplitude of every frequency in the last axis of signal against a sine
+        reference, mixing all tones at once with the windowed references """
+    signal = np.asarray(signal, dtype=float)
+    n_samples = signal.shape[-1]
+    weights = windows[window](n_samples)
+    weighted = (signal - (signal @ weights / weights.sum())[..., None]) * weights
+    t = np.arange(n_samples) / sample_rate
+    references = np.exp(-2j * np.pi * np.asarray(frequencies, dtype=float)[:, None] * t)
+    return 2j * (weighted @ references.T) / weights.sum()
+
+def _measurment(peaks : np.ndarray, reference = None) -> LIA_measurment:
+    values = peaks / math.sqrt(2)
+    if reference is not None:
+        reference = np.asarray(reference)
+        values = values * np.exp(-1j * (np.angle(reference) if np.iscomplexobj(reference) else reference))
+    return LIA_measurment(values.real, values.imag, np.abs(values), np.degrees(np.angle(values)))
+
+def demodulate(signal, frequencies, sample_rate : float, window : str = "hann", reference = None) -> LIA_measurment:
+    """ X, Y, R in rms and theta in degrees of every frequency like the SR860 reports them.
+        reference are the phases in radians or the complex phasors the theta are relative to """
+    return _measurment(phasors(signal, frequencies, sample_rate, window), reference)
+
+class SoftwareLockIn():
+    """ Lock-in detection of many frequencies from one capture. The SMU sources offset plus a
+        multitone on its list sweep engine and measures every step, the trigger timer paces
+        the steps at sample_rate so the response is digitised in step with the excitation.
+        The response tones are demodulated against the measured excitation tones, a frequency
+        sweep costs a single capture. Driving the drain current gives the drain response
+        dV/dI, not the gate driven response the LIA sweep records as X, Y, R and theta """
+    def __init__(self, smu : SMU, sample_rate : float, n_samples : int, window : str = "hann", aperture : float = None):
+        if window not in windows:
+            raise Exception(f"Invalid window {window}")
+        if aperture is not None and aperture >= 1 / sample_rate:
+            raise Exception(f"Aperture {aperture:g} s does not fit the sample period {1 / sample_rate:g} s")
+        self.smu = smu
+        self.sample_rate = sample_rate
+        self.n_samples = int(n_samples)
+        self.window = window
+        self.aperture = aperture
+
+    def measure(self, frequencies, amplitude : float, offset : float):
+        """ Drive offset plus amplitude at every frequency as a current, returns the frequencies
+            actually measured and the drain voltage response as a LIA_measurment of arrays """
+        frequencies = coherent_frequencies(frequencies, self.sample_rate, self.n_samples,
+                                           spacing=1 if self.window == "rect" else 2)
+        waveform = multitone(frequencies, amplitude, self.sample_rate, self.n_samples, offset=offset)
+        readings = self.smu.performCurrentSweep(waveform, 0, self.aperture, period=1 / self.sample_rate)
+        response, excitation = phasors(readings.T, frequencies, self.sample_rate, self.window)
+        return frequencies, _measurment(response, excitation)
@@ -0,0 +1,94 @@
+from itertools import islice
+import numpy as np
+
+class RunningStats():
+    """ Online Welford mean and variance of every column of a stream of readings """
+    __slots__ = ("n", "rejected", "mean", "_m2")
+
+    def __init__(self):
+        self.n = 0
+        self.rejected = 0
+        self.mean = None
+        self._m2 = None
+
+    def push(self, sample):
+        sample = np.asarray(sample, dtype=float)
+        self.n += 1
+        if self.mean is None:
+            self.mean = sample.copy()
+            self._m2 = np.zeros_like(sample)
+            return
+        delta = sample - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (sample - self.mean)
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.n < 2:
+            return np.full_like(self.mean, np.nan)
+        return self._m2 / (self.n - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    @property
+    def sem(self) -> np.ndarray:
+        """ Standard error of the mean """
+        return self.std / np.sqrt(self.n)
+
+def readings(read, first = None):
+    """ Endless stream of readings, starting with an already taken one """
+    if first is not None:
+        yield np.asarray(first, dtype=float)
+    while True:
+        yield np.asarray(read(), dtype=float)
+
+def reject_outliers(samples, stats : RunningStats, threshold : float, min_samples : int):
+    """ Drop samples further than threshold standard deviations from the running mean in any
+        column, once min_samples are accepted. A threshold of 0 keeps every sample """
+    for sample in samples:
+        if threshold and stats.n >= max(min_samples, 2):
+            std = stats.std
+            if np.any((std > 0) & (np.abs(sample - stats.mean) > threshold * std)):
+                stats.rejected += 1
+                continue
+        yield sample
+
+def accumulate(samples, stats : RunningStats):
+    for sample in samples:
+        stats.push(sample)
+        yield stats
+
+def until_converged(updates, target, min_samples : int):
+    """ Pass the running statistics on until the standard error of every column is below target """
+    for stats in updates:
+        yield stats
+        if stats.n >= max(min_samples, 2) and np.all(stats.sem <= target(stats.mean)):
+            return
+
+class Averager():
+    """ Repeats a reading at one setpoint and reduces it to mean and standard error on the fly,
+        stops as soon as the standard error reaches the target or max samples were read """
+    def __init__(self, settings : dict):
+        self._max_samples = max(int(settings.get("max samples", 1)), 1)
+        self._min_samples = int(settings.get("min samples", 3))
+        self._relative_sem = settings.get("relative sem", 1e-3)
+        self._absolute_sem = settings.get("absolute sem", 0)
+        self._outlier_threshold = settings.get("outlier threshold", 0)
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_samples > 1
+
+    def target(self, mean) -> np.ndarray:
+        return self._relative_sem * np.abs(mean) + self._absolute_sem
+
+    def average(self, read, first = None) -> RunningStats:
+        """ Read until converged, first is a reading already taken at this setpoint """
+        stats = RunningStats()
+        samples = islice(readings(read, first), self._max_samples)
+        samples = reject_outliers(samples, stats, self._outlier_threshold, self._min_samples)
+        for _ in until_converged(accumulate(samples, stats), self.target, self._min_samples):
+            pass
+        return stats
@@ -0,0 +1,61 @@
+import numpy as np
+
+class SweepPlan():
+    """ Explicit point table for a multi axis sweep, ordered to minimise expensive transitions.
+        The costliest axis is outermost and every inner axis runs serpentine, so consecutive
+        points differ in one axis only and each outer value is set once per pass """
+    def __init__(self, axes : dict, transition_costs : dict, point_cost : float = 0):
+        """ axes maps axis name to its values in nesting order, transition_costs maps axis
+            name to the seconds it takes to settle after that axis changes """
+        self._axes = {name: np.atleast_1d(np.asarray(values, dtype=float)) for name, values in axes.items()}
+        self._costs = {name: transition_costs.get(name, 0) for name in self._axes}
+        self._point_cost = point_cost
+        names = list(self._axes)
+        self._order = sorted(names, key=lambda name: -self._costs[name])
+        self.points = self._compile(names)
+
+    @staticmethod
+    def _serpentine(lengths):
+        if not lengths:
+            return [()]
+        inner = SweepPlan._serpentine(lengths[1:])
+        order = []
+        for i in range(lengths[0]):
+            order.extend((i,) + rest for rest in (inner if i % 2 == 0 else inner[::-1]))
+        return order
+
+    def _compile(self, names):
+        lengths = [len(self._axes[name]) for name in self._order]
+        ordered = np.array(self._serpentine(lengths), dtype=np.int64).reshape(-1, len(lengths))
+        indices = {name: ordered[:, i] for i, name in enumerate(self._order)}
+        dtype = [("index", np.int64)] + [(name, np.float64) for name in names]
+        points = np.empty(len(ordered), dtype=dtype)
+        points["index"] = np.ravel_multi_index(
+            [indices[name] for name in names],
+            [len(self._axes[name]) for name in names])
+        for name in names:
+            points[name] = self._axes[name][indices[name]]
+        return points
+
+    @property
+    def axes(self) -> list:
+        """ Axis names from outermost to innermost in execution order """
+        return list(self._order)
+
+    def transition_times(self) -> np.ndarray:
+        """ Worst case settling time before each point, the first point pays for every axis """
+        costs = np.zeros((len(self._axes), len(self.points)))
+        for i, name in enumerate(self._axes):
+            values = self.points[name]
+            costs[i, 0] = self._costs[name]
+            costs[i, 1:] = np.where(values[1:] != values[:-1], self._costs[name], 0)
+        return costs.max(axis=0) + self._point_cost
+
+    def predicted_duration(self) -> float:
+        return float(self.transition_times().sum())
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        return iter(self.points)
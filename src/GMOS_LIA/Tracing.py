@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import threading
+from collections import deque, defaultdict
+from contextlib import contextmanager
+import numpy as np
+
+def command_key(command : str) -> str:
+    """ Headers of a (batched) command without their arguments, 'SOUR:VOLT 1;OUTP 1' -> 'SOUR:VOLT;OUTP' """
+    return ";".join(part.strip().lstrip(":").split(" ", 1)[0] for part in command.split(";"))
+
+class Tracer():
+    """ In memory trace of every instrument transaction with its command, instrument, bytes
+        and monotonic start and duration, plus the sweep spans and point marks around them.
+        Events are plain tuples appended to a bounded deque so recording costs about a
+        microsecond, while disabled the instruments only check the enabled flag """
+    def __init__(self, capacity : int = 1000000):
+        self.enabled = False
+        self._events = deque(maxlen=capacity)
+
+    def enable(self, capacity : int = None):
+        if capacity is not None and capacity != self._events.maxlen:
+            self._events = deque(self._events, maxlen=capacity)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        self._events.clear()
+
+    @contextmanager
+    def tracing(self, enabled : bool = True, capacity : int = None):
+        """ Trace the enclosed block when enabled, the previous state is restored on exit so
+            one traced setup does not leave tracing on for every later one """
+        previous = self.enabled
+        if enabled:
+            self.enable(capacity)
+        try:
+            yield self
+        finally:
+            self.enabled = previous
+
+    @staticmethod
+    def now() -> int:
+        return time.perf_counter_ns()
+
+    def record(self, kind : str, instrument : str, command : str, n_bytes : int, start : int):
+        """ Transaction of kind write, query or binary which started at start ns """
+        self._events.append((kind, instrument, command, start, time.perf_counter_ns() - start,
+                             threading.get_ident(), n_bytes))
+
+    @contextmanager
+    def span(self, name : str, category : str = "sweep"):
+        """ Time the enclosed block as one span of the timeline """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._events.append(("span", category, name, start, time.perf_counter_ns() - start,
+                                 threading.get_ident(), 0))
+
+    def mark(self, name : str, category : str = "point"):
+        """ Instant event, e.g. a recorded point """
+        if self.enabled:
+            self._events.append(("mark", category, name, time.perf_counter_ns(), 0, threading.get_ident(), 0))
+
+    def events(self, start : int = None, end : int = None) -> list:
+        """ Recorded events starting inside [start, end) ns """
+        events = list(self._events)
+        if start is not None:
+            events = [event for event in events if event[3] >= start]
+        if end is not None:
+            events = [event for event in events if event[3] < end]
+        return events
+
+    def summary(self, start : int = None, end : int = None) -> dict:
+        """ Transactions and bus time by instrument and by instrument command, slowest first,
+            with the latency percentiles of each command and the counts per recorded point """
+        events = self.events(start, end)
+        transactions = [event for event in events if event[0] not in ("span", "mark")]
+        points = sum(1 for event in events if event[0] == "mark" and event[1] == "point")
+        durations = defaultdict(list)
+        n_bytes = defaultdict(int)
+        instruments = defaultdict(lambda: {"transactions": 0, "time": 0.0, "bytes": 0})
+        for kind, instrument, command, _, duration, _, size in transactions:
+            key = (instrument, command_key(command))
+            durations[key].append(duration * 1e-9)
+            n_bytes[key] += size
+            instruments[instrument]["transactions"] += 1
+            instruments[instrument]["time"] += duration * 1e-9
+            instruments[instrument]["bytes"] += size
+        commands = {}
+        for (instrument, key), values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+            values = np.array(values)
+            commands[f"{instrument} {key}"] = {
+                "count" : len(values),
+                "time"  : float(values.sum()),
+                "mean"  : float(values.mean()),
+                "p50"   : float(np.percentile(values, 50)),
+                "p90"   : float(np.percentile(values, 90)),
+                "max"   : float(values.max()),
+                "bytes" : n_bytes[(instrument, key)],
+                "per point": len(values) / points if points else None}
+        span = (max(event[3] + event[4] for event in events) - min(event[3] for event in events)) if events else 0
+        return {
+            "duration"     : span * 1e-9,
+            "points"       : points,
+            "transactions" : len(transactions),
+            "bus time"     : sum(instrument["time"] for instrument in instruments.values()),
+            "instruments"  : dict(sorted(instruments.items(), key=lambda item: -item[1]["time"])),
+            "commands"     : commands}
+
+    def histograms(self, edges = None, start : int = None, end : int = None) -> dict:
+        """ Latency histogram of every instrument command, log spaced from 10 us to 10 s by default """
+        edges = np.logspace(-5, 1, 25) if edges is None else np.asarray(edges)
+        durations = defaultdict(list)
+        for kind, instrument, command, _, duration, _, _ in self.events(start, end):
+            if kind not in ("span", "mark"):
+                durations[f"{instrument} {command_key(command)}"].append(duration * 1e-9)
+        return {"edges": edges.tolist(),
+                "commands": {key: np.histogram(values, edges)[0].tolist() for key, values in durations.items()}}
+
+    def export_chrome_trace(self, filename : str, start : int = None, end : int = None):
+        """ Write the events as a Chrome trace event file, viewable in chrome://tracing or Perfetto """
+        pid = os.getpid()
+        trace_events = []
+        for kind, category, name, event_start, duration, thread, size in self.events(start, end):
+            event = {"cat": category, "ts": event_start / 1e3, "pid": pid, "tid": thread}
+            if kind == "mark":
+                event.update(name=name, ph="i", s="t")
+            elif kind == "span":
+                event.update(name=name, ph="X", dur=duration / 1e3)
+            else:
+                event.update(name=command_key(name), ph="X", dur=duration / 1e3,
+                             args={"command": name, "kind": kind, "bytes": size})
+            trace_events.append(event)
+        with open(filename, 'w') as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+
+def format_summary(summary : dict, top : int = 10) -> str:
+    """ Readable table of a Tracer.summary """
+    lines = [f"{summary['transactions']} transactions, {summary['bus time']:.3f} s on the bus "
+             f"of {summary['duration']:.3f} s, {summary['points']} points"]
+    for name, instrument in summary["instruments"].items():
+        lines.append(f"  {name}: {instrument['transactions']} transactions, {instrument['time']:.3f} s, {instrument['bytes']} bytes")
+    for name, command in list(summary["commands"].items())[:top]:
+        per_point = f", {command['per point']:.1f}/point" if command["per point"] is not None else ""
+        lines.append(f"  {name}: {command['count']} x {1e3 * command['mean']:.2f} ms "
+                     f"(p90 {1e3 * command['p90']:.2f} ms) = {command['time']:.3f} s{per_point}")
+    return "\n".join(lines)
+
+tracer = Tracer()
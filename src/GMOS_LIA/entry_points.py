@@ -1,10 +1,16 @@
 import code
+import sys
+import argparse
 import numpy as np
 import os
 from itertools import product
 from pyvisa import ResourceManager
 from GMOS_LIA.LabDevices import SMU, LIA
-from GMOS_LIA.LIASetup import IVTester, ThreeTTester
+from GMOS_LIA.LIASetup import BaseSetup, IVTester, ThreeTTester, load_setup_config
+from GMOS_LIA.ResultPlotter import Plotter
+from GMOS_LIA.MeasurementServer import MeasurementServer, MeasurementClient
+from GMOS_LIA.BenchScheduler import BenchScheduler
+from GMOS_LIA.ResultCatalogue import ResultCatalogue
 
 def resource_manager(func):
     def wrapper(*args):
@@ -21,6 +27,87 @@ def GMOS_3T_NOCATALIST(visa_manager):
         t3t.perform_measurements()
         t3t.plot()
 
+@resource_manager
+def monitor(visa_manager):
+    """ Monitor the 3T setup at its configured setpoint, for the seconds given as argument or until interrupted """
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    with ThreeTTester(visa_manager) as t3t:
+        t3t.monitor(duration)
+
+def replot():
+    """ Re-plot all results whose data changed, optionally under the directory given as argument """
+    setup = load_setup_config("setup.json")
+    results_dir = sys.argv[1] if len(sys.argv) > 1 else BaseSetup._measurement_results_dir
+    images = Plotter.replot_tree(results_dir, setup[setup["plotter"]])
+    print(f"Re-plotted {len(images)} result files under {results_dir}")
+
+def _value_range(text):
+    """ 'low:high' with either end optional, or a single value """
+    if ":" not in text:
+        return float(text)
+    low, high = text.split(":", 1)
+    return (float(low) if low else None, float(high) if high else None)
+
+def catalogue():
+    """ Index result trees into the results catalogue and find catalogued runs """
+    parser = argparse.ArgumentParser(description="Results catalogue of all measurement runs")
+    parser.add_argument("--catalogue", help="catalogue database, catalogue.sqlite in the results directory by default")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index = commands.add_parser("index", help="add new and changed result files, drop deleted ones")
+    index.add_argument("results_dir", nargs="?", default=BaseSetup._measurement_results_dir)
+    find = commands.add_parser("find", help="list the runs matching all given conditions")
+    find.add_argument("--tester")
+    find.add_argument("--device", help="part of a device IDN")
+    find.add_argument("--since", help="start time as %%Y%%m%%d-%%H%%M%%S")
+    find.add_argument("--until", help="start time as %%Y%%m%%d-%%H%%M%%S")
+    find.add_argument("--axis", nargs=2, action="append", default=[], metavar=("NAME", "LOW:HIGH"),
+                      help="sweep axis covering a value or overlapping a range, e.g. --axis 'heater voltage' 3")
+    find.add_argument("--column", nargs=2, action="append", default=[], metavar=("NAME", "LOW:HIGH"),
+                      help="result column overlapping a range, e.g. --column R 1e-3:")
+    show = commands.add_parser("show", help="print everything catalogued about one result file")
+    show.add_argument("path", help="result file without extension")
+    args = parser.parse_args()
+
+    results = ResultCatalogue(args.catalogue or os.path.join(BaseSetup._measurement_results_dir, ResultCatalogue.filename))
+    if args.command == "index":
+        counts = results.index_tree(args.results_dir)
+        print(", ".join(f"{count} {state}" for state, count in counts.items()))
+    elif args.command == "find":
+        axes = {name: _value_range(value) for name, value in args.axis}
+        columns = {name: _value_range(value) for name, value in args.column}
+        for entry in results.find(args.tester, args.device, args.since, args.until, columns, **axes):
+            print(f"{entry.start_time}  {entry.tester}  {entry.rows} rows  {entry.path}")
+    else:
+        for name, value in results.describe(args.path).items():
+            print(f"{name}: {value}")
+
+def run_benches():
+    """ Run the testers of all benches in the "benches" section of setup.json in parallel,
+        the pyvisa backend may be given as argument """
+    scheduler = BenchScheduler.from_setup(load_setup_config("setup.json"),
+                                          visa_library=sys.argv[1] if len(sys.argv) > 1 else "")
+    scheduler.run(progress=print)
+    print(scheduler.summary())
+
+def serve():
+    """ Run the measurement server until a client shuts it down """
+    parser = argparse.ArgumentParser(description="Queue and run sweeps on the bench for local clients")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5025)
+    parser.add_argument("--socket", help="serve on this Unix socket path instead of TCP")
+    parser.add_argument("--devices", help="setup.json section of device addresses, e.g. 'Mock devices'")
+    parser.add_argument("--visa-library", default="", help="pyvisa backend, e.g. '@py' or '@mock'")
+    args = parser.parse_args()
+    rm = ResourceManager(args.visa_library)
+    server = MeasurementServer(rm, args.socket or (args.host, args.port), args.devices)
+    print(f"Measurement server listening on {server.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rm.close()
+
 @resource_manager
 def cli():
     console = code.InteractiveConsole(locals=globals())
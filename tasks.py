@@ -20,4 +20,11 @@ def all(c):
     """ Run all suit of checks """
     format(c)
     lint(c)
-    test(c)
\ No newline at end of file
+    test(c)
+@task
+def bench(c, baseline=None):
+    """ Benchmark sweep throughput on the simulated instruments """
+    command = "python -m GMOS_LIA.Benchmark --output benchmark_report.json"
+    if baseline:
+        command += f" --baseline {baseline}"
+    c.run(command, pty = True)
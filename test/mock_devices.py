@@ -2,7 +2,14 @@ from collections import defaultdict
 from pyvisa_mock.base.base_mocker import BaseMocker, scpi
 from pyvisa_mock.base.register import register_resource
 
-class MockLIA(BaseMocker):
+class CompoundCommandMocker(BaseMocker):
+    def send(self, scpi_string: str):
+        responses = [super(CompoundCommandMocker, self).send(command.lstrip(":"))
+                     for command in scpi_string.split(";")]
+        responses = [str(response) for response in responses if response is not None]
+        return ";".join(responses) if responses else None
+
+class MockLIA(CompoundCommandMocker):
     def __init__(self):
         super().__init__()
         self.frequency = 0.0
@@ -53,7 +60,7 @@ class MockLIA(BaseMocker):
     def auto_phase(self) -> str:
         return "0"  # dummy response
 
-class MockSMU(BaseMocker):
+class MockSMU(CompoundCommandMocker):
     def __init__(self):
         super().__init__()
         self.resistance = 1e3
@@ -64,6 +71,9 @@ class MockSMU(BaseMocker):
         self.output_on = False
         self.v_compliance = None
         self.c_compliance = None
+        self.sweep_list = []
+        self.trigger_count = 1
+        self.sweep_results = []
  
     @scpi("*IDN?")
     def idn(self) -> str:
@@ -96,6 +106,54 @@ class MockSMU(BaseMocker):
     def set_voltage_mode(self) -> None:
         self.source_mode = "FIX"
 
+    @scpi("SOUR:VOLT:MODE LIST")
+    def set_voltage_list_mode(self) -> None:
+        self.source_mode = "LIST"
+
+    @scpi("SOUR:LIST:VOLT <values>")
+    def set_voltage_list(self, values: str) -> None:
+        self.sweep_list = [float(value) for value in values.split(",")]
+
+    @scpi("FORM:ELEM:SENS <elements>")
+    def set_sense_elements(self, elements: str) -> None:
+        self.sense_elements = elements
+
+    @scpi("TRIG:SOUR <source>")
+    def set_trigger_source(self, source: str) -> None:
+        self.trigger_source = source
+
+    @scpi("TRIG:COUN <count>")
+    def set_trigger_count(self, count: str) -> None:
+        self.trigger_count = int(count)
+
+    @scpi("TRIG:ACQ:DEL <delay>")
+    def set_acquire_delay(self, delay: str) -> None:
+        self.acquire_delay = float(delay)
+
+    @scpi("SENS:VOLT:APER <aperture>")
+    def set_voltage_aperture(self, aperture: str) -> None:
+        self.voltage_aperture = float(aperture)
+
+    @scpi("SENS:CURR:APER <aperture>")
+    def set_current_aperture(self, aperture: str) -> None:
+        self.current_aperture = float(aperture)
+
+    @scpi("INIT")
+    def initiate(self) -> None:
+        self.sweep_results = []
+        sweep = self.sweep_list if self.source_mode == "LIST" else [self.voltage] * self.trigger_count
+        for voltage in sweep[:self.trigger_count]:
+            current = voltage / self.resistance
+            self.sweep_results.append(f"{voltage},{current}")
+
+    @scpi("*OPC?")
+    def operation_complete(self) -> str:
+        return "1"
+
+    @scpi("FETC:ARR?")
+    def fetch_array(self) -> str:
+        return ",".join(self.sweep_results)
+
     @scpi("SOUR:CURR:MODE FIX")
     def set_current_mode(self) -> None:
         self.source_mode = "FIX"
@@ -143,6 +201,14 @@ class MockSMU(BaseMocker):
     def set_current_compliance(self, value: float) -> None:
         self.c_compliance = value
 
+    @scpi("SENS:FUNC <functions>")
+    def set_sense_functions(self, functions: str) -> None:
+        self.sense_functions = functions
+
+    @scpi("MEAS?")
+    def measure(self) -> str:
+        return f"{self.voltage},{self.current}"
+
     @scpi("MEAS:CURR:DC?")
     def measure_current(self) -> str:
         return str(self.current)
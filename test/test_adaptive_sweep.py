@@ -0,0 +1,73 @@
+import pytest
+import numpy as np
+from GMOS_LIA.AdaptiveSweep import refine
+from GMOS_LIA.LabDevices import instrument_pool
+from GMOS_LIA.LIASetup import ThreeTTester, load_setup_config
+from GMOS_LIA.Simulation import SimulatedResourceManager
+
+def step(x):
+    return np.tanh((np.asarray(x) - 0.95) / 0.02)
+
+def test_refines_steep_region_only():
+    x = np.arange(0.8, 1.1, 0.05)
+    new = refine(x, step(x), tolerance=0.1)
+    assert len(new) > 0
+    assert np.all((new > 0.85) & (new < 1.05))
+    assert np.all(np.diff(new) > 0)
+
+def test_flat_curve_is_not_refined():
+    x = np.linspace(0, 1, 5)
+    assert len(refine(x, np.ones(5), tolerance=0.1)) == 0
+
+def test_budget_and_min_step():
+    x = np.arange(0.8, 1.1, 0.05)
+    assert len(refine(x, step(x), tolerance=0.01, budget=2)) == 2
+    assert len(refine(x, step(x), tolerance=0.01, min_step=0.05)) == 0
+
+def test_refinement_converges_with_fewer_points_than_a_fine_grid():
+    x = list(np.arange(0.8, 1.1, 0.05))
+    y = list(step(x))
+    while True:
+        new = refine(x, y, tolerance=0.1, min_step=2e-3, budget=50 - len(x))
+        if len(new) == 0:
+            break
+        x += list(new)
+        y += list(step(new))
+    fine = np.arange(0.8, 1.1, 2e-3)
+    assert len(x) < len(fine) / 2
+    order = np.argsort(x)
+    assert np.max(np.abs(np.interp(fine, np.array(x)[order], np.array(y)[order]) - step(fine))) < 0.25
+
+class Interrupted(Exception):
+    pass
+
+def adaptive_sweep(res_man, results_root, interrupt_after = None, resume = False):
+    with ThreeTTester(res_man, results_root=results_root) as t3t:
+        t3t._tester_info["sweep type"] = "adaptive"
+        t3t._sleep_time = 5e-3
+        t3t._heater_sleep = 20e-3
+        def interrupt(measurment):
+            if interrupt_after is not None and len(t3t.results) >= interrupt_after:
+                raise Interrupted()
+        t3t.add_result_listener(interrupt)
+        results = t3t.perform_measurements(heater_voltage=3, lia_offset=[0.8, 1.1, 0.05], resume=resume)
+        return results, t3t._adaptive_budget
+
+@pytest.mark.parametrize("interrupts", [[5], [9], [5, 10]])
+def test_resumed_refinement_uses_the_whole_pass(tmp_path, interrupts):
+    res_man = SimulatedResourceManager.from_setup(load_setup_config("setup.json"),
+                                                  settings={"latency": 0, "heater time constant": 5e-3, "noise": 0})
+    instrument_pool.release()
+    for count, interrupt_after in enumerate(interrupts):
+        with pytest.raises(Interrupted):
+            adaptive_sweep(res_man, str(tmp_path), interrupt_after, resume=count > 0)
+    results, budget = adaptive_sweep(res_man, str(tmp_path), resume=True)
+    instrument_pool.release()
+    offsets, values = results["lia offset"], results["R"]
+    coarse = np.arange(0.8, 1.1, 0.05)
+    refined = offsets[len(coarse):]
+    assert np.allclose(offsets[:len(coarse)], coarse)
+    assert len(np.unique(offsets)) == len(offsets)
+    assert 0 < len(refined) <= budget
+    assert refined.min() < coarse[-2]
+    assert len(refined) == budget or len(refine(offsets, values, 0.1, 5e-3, budget - len(refined))) == 0
@@ -0,0 +1,28 @@
+import os
+import pytest
+from GMOS_LIA.BenchScheduler import BenchScheduler
+
+def register_mock_devices():
+    from pyvisa_mock.base.register import register_resource
+    from mock_devices import MockLIA, MockSMU
+    register_resource("MOCK0::LIA::INSTR", MockLIA())
+    register_resource("MOCK0::SMU::INSTR", MockSMU())
+    register_resource("MOCK1::SMU::INSTR", MockSMU())
+
+def test_runs_benches_in_isolation(tmp_path):
+    benches = [
+        {"name": "mock", "devices": "Mock devices", "tester": "IVTester", "parameters": {"smu_voltage": [0, 1, 0.25]}},
+        {"name": "missing", "devices": "Missing devices", "tester": "IVTester"}]
+    scheduler = BenchScheduler(benches, "@mock", str(tmp_path), register_mock_devices)
+    changes = []
+    statuses = scheduler.run(progress=lambda status: changes.append((status.name, status.status)))
+    assert statuses["mock"].status == "done"
+    assert statuses["mock"].rows == 4
+    assert statuses["mock"].result_file.startswith(os.path.join(str(tmp_path), "mock"))
+    assert statuses["missing"].status == "failed"
+    assert "Missing devices" in statuses["missing"].error
+    assert ("mock", "done") in changes
+
+def test_rejects_unknown_tester():
+    with pytest.raises(Exception):
+        BenchScheduler([{"name": "bench", "devices": "Mock devices", "tester": "FourTTester"}])
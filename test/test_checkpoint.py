@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from GMOS_LIA.Checkpoint import CheckpointJournal
+from GMOS_LIA.ResultSinks import open_result_sink, load_results, truncate_results
+
+COLUMNS = ["x", "y"]
+
+def test_journal_round_trip(tmp_path):
+    result_file = str(tmp_path / "result")
+    plan_hash = CheckpointJournal.plan_hash("IVTester", COLUMNS, np.arange(4.0))
+    journal = CheckpointJournal(result_file, plan_hash).open()
+    journal.mark(1)
+    journal.mark(0)
+    journal.commit(2)
+    journal.set_operation_point("3", 1e-6)
+    journal.set_refined(0)
+    journal.mark(2)
+    journal.close()
+
+    resumed = CheckpointJournal(result_file, plan_hash)
+    assert resumed.load()
+    assert resumed.completed == {0, 1}
+    assert resumed.points == [1, 0]
+    assert resumed.refined == {0}
+    assert resumed.rows == 2
+    assert resumed.operation_points == {"3": 1e-6}
+    assert not resumed.done
+    assert not CheckpointJournal(result_file, CheckpointJournal.plan_hash(np.arange(5.0))).load()
+
+def test_find_resumable_skips_finished_runs(tmp_path):
+    plan_hash = CheckpointJournal.plan_hash(np.arange(4.0))
+    for run, finished in (("20240101-000000", False), ("20240102-000000", True)):
+        (tmp_path / run).mkdir()
+        journal = CheckpointJournal(str(tmp_path / run / "result"), plan_hash).open()
+        if finished:
+            journal.finish()
+        journal.close()
+    run_dirs = [str(path) for path in tmp_path.iterdir()]
+    journal = CheckpointJournal.find_resumable(run_dirs, "result", plan_hash)
+    assert journal.filename == str(tmp_path / "20240101-000000" / "result.ckpt")
+
+@pytest.mark.parametrize("result_format", ["csv", "binary"])
+def test_append_after_truncate(tmp_path, result_format):
+    path = str(tmp_path / "result")
+    settings = {"format": result_format}
+    with open_result_sink(settings, path, COLUMNS, {}) as sink:
+        for row in ([0, 0], [1, 1], [2, 2]):
+            sink.write_row(row)
+    truncate_results(path, 2)
+    with open_result_sink(settings, path, COLUMNS, {}, append=True) as sink:
+        sink.write_row([3, 3])
+    data, _ = load_results(path)
+    assert np.array_equal(data, [[0, 0], [1, 1], [3, 3]])
@@ -0,0 +1,124 @@
+import pytest
+import numpy as np
+from GMOS_LIA.LabDevices import SMU, LIA, LIA_consants, instrument_pool
+from GMOS_LIA.LIASetup import ThreeTTester, load_setup_config
+from GMOS_LIA.Simulation import SimulatedResourceManager
+
+devices = {"SIM::DRAIN": "drain SMU", "SIM::LIA": "LIA"}
+
+def sent_messages(device):
+    """ Messages the device puts on the bus from now on, in order """
+    messages = []
+    write, query = device.inst.write, device.inst.query
+    def record_write(message):
+        messages.append(message)
+        return write(message)
+    def record_query(message):
+        messages.append(message)
+        return query(message)
+    device.inst.write, device.inst.query = record_write, record_query
+    return messages
+
+@pytest.fixture
+def res_man():
+    return SimulatedResourceManager(devices, {"latency": 0})
+
+def test_batch_joins_commands(res_man):
+    lia = LIA(res_man, "SIM::LIA", "LIA")
+    messages = sent_messages(lia)
+    with lia.batch():
+        lia.setOutputFrequency(1000)
+        lia.setOutputAmplitude(0.05)
+        assert messages == []
+    assert messages == ["FREQ 1000;SLVL 0.05"]
+
+def test_smu_batch_roots_every_command(res_man):
+    smu = SMU(res_man, "SIM::DRAIN", "Drain SMU")
+    messages = sent_messages(smu)
+    with smu.batch():
+        smu.setFunctionCurrentFixed()
+        smu.setCurrent(1e-6)
+        smu.write("*CLS")
+        smu.setOn()
+    assert messages == [":FUNC:MODE CURR;:SOUR:CURR:MODE FIX;:SOUR:CURR 1e-06;*CLS;:OUTP 1"]
+
+def test_query_flushes_batch(res_man):
+    smu = SMU(res_man, "SIM::DRAIN", "Drain SMU")
+    messages = sent_messages(smu)
+    with smu.batch():
+        smu.setVoltageCompliance(2.5)
+        assert smu.query(":SENS:VOLT:PROT:TRIP?").strip() == "0"
+    assert messages == [":SENS:VOLT:PROT 2.5;:SENS:VOLT:PROT:TRIP?"]
+
+def test_batch_discarded_on_exception(res_man):
+    smu = SMU(res_man, "SIM::DRAIN", "Drain SMU")
+    messages = sent_messages(smu)
+    with pytest.raises(RuntimeError):
+        with smu.batch():
+            smu.setCurrent(2e-6)
+            raise RuntimeError("interrupted")
+    assert messages == []
+    smu.setCurrent(2e-6)
+    assert messages == ["SOUR:CURR 2e-06"]
+
+def test_measurement_after_sweep_triggers_one_reading(res_man):
+    smu = SMU(res_man, "SIM::DRAIN", "Drain SMU")
+    assert smu.measureMultiple(5, aperture=1e-4).shape == (5, 2)
+    messages = sent_messages(smu)
+    smu.getMeasurement()
+    smu.getMeasurement()
+    assert messages == [":TRIG:COUN 1;:MEAS?", "MEAS?"]
+
+@pytest.mark.parametrize("sample_rate, n_samples, config, divider, kbytes",
+    [(1e3, 100, LIA_consants.capture_xyrt, 11, 2),
+    (10e3, 300, LIA_consants.capture_xy, 7, 3),
+    (1e9, 10, LIA_consants.capture_x, 0, 1)])
+def test_capture_rate_and_length(res_man, sample_rate, n_samples, config, divider, kbytes):
+    lia = LIA(res_man, "SIM::LIA", "LIA")
+    rate = lia.configureCapture(sample_rate, n_samples, config)
+    assert rate == pytest.approx(1.25e6 / 2 ** divider)
+    assert rate <= sample_rate or divider == 0
+    capture = lia.inst.instrument
+    assert (capture.capture_config, capture.capture_divider, capture.capture_kbytes) == (config, divider, kbytes)
+
+@pytest.mark.parametrize("config, columns", [(LIA_consants.capture_xyrt, 4), (LIA_consants.capture_rt, 2)])
+def test_capture_block_reshaped_to_samples(config, columns):
+    res_man = SimulatedResourceManager(devices, {"latency": 0, "noise": 0, "lia noise": 0})
+    lia = LIA(res_man, "SIM::LIA", "LIA")
+    lia.write("OFLT 0")
+    lia.setOutputAmplitude(0.05)
+    lia.setOutputOffset(0.95)
+    snapshot = lia.getLIAMeasurment()
+    rate = lia.configureCapture(10e3, 40, config)
+    data = lia.acquireCapture(40, rate)
+    assert data.shape == (40, columns)
+    assert data.dtype == np.float32
+    expected = list(snapshot) if config == LIA_consants.capture_xyrt else [snapshot.R, snapshot.theta]
+    assert np.allclose(data, expected, rtol=1e-5)
+
+def test_stalled_capture_times_out_and_stops(res_man):
+    lia = LIA(res_man, "SIM::LIA", "LIA")
+    lia.capture_margin = 0.05
+    rate = lia.configureCapture(10e3, 40)
+    lia.inst.instrument._CAPTURESTART = lambda argument: None
+    messages = sent_messages(lia)
+    with pytest.raises(TimeoutError):
+        lia.acquireCapture(40, rate)
+    assert messages[-1] == "CAPTURESTOP"
+
+def test_three_t_tester_averages_lia_captures(tmp_path):
+    res_man = SimulatedResourceManager.from_setup(load_setup_config("setup.json"),
+                                                  settings={"latency": 0, "heater time constant": 10e-3})
+    instrument_pool.release()
+    with ThreeTTester(res_man, results_root=str(tmp_path)) as t3t:
+        t3t._sleep_time = 5e-3
+        t3t._heater_sleep = 50e-3
+        t3t._lia_samples = 64
+        t3t._lia_sample_rate = 10e3
+        results = t3t.perform_measurements(lia_offset=[0.9, 1.0, 0.05])
+        capture = t3t.lia.inst.instrument
+    instrument_pool.release()
+    assert capture.capture_start is not None and capture.capture_kbytes == 1
+    assert results.dtype.names == ("lia offset", "X", "R", "settle time")
+    assert len(results) == 2
+    assert np.all(np.abs(results["X"]) <= results["R"])
@@ -1,7 +1,8 @@
+import asyncio
 import pytest
 from pyvisa import ResourceManager
 import numpy as np
-from GMOS_LIA.LabDevices import SMU, LIA
+from GMOS_LIA.LabDevices import SMU, LIA, instrument_pool
 from GMOS_LIA.LIASetup import IVTester, ThreeTTester
 
 def test_lia_wrapper(resource_manager):
@@ -12,11 +13,67 @@ def test_lia_wrapper(resource_manager):
 
 def test_smu_init(resource_manager):
     smu = SMU(resource_manager, "MOCK0::SMU::INSTR", "test SMU")
+
+def test_setpoint_cache(resource_manager):
+    smu = SMU(resource_manager, "MOCK0::SMU::INSTR", "test SMU")
+    smu.setFunctionVoltageFixed()
+    smu.setCurrentCompliance(1e-3)
+    smu.setVoltage(0.5)
+    smu.setVoltage(0.5)
+    assert smu.skipped_writes == 1
+    smu.setVoltage(0.5, force=True)
+    assert smu.skipped_writes == 1
+    smu.reset()
+    smu.setCurrentCompliance(1e-3)
+    smu.setVoltage(0.5)
+    assert smu.skipped_writes == 1
     
+def test_smu_multiple_readings(resource_manager):
+    smu = SMU(resource_manager, "MOCK0::SMU::INSTR", "test SMU")
+    smu.setFunctionVoltageFixed()
+    smu.setCurrentCompliance(1)
+    smu.setVoltage(2)
+    readings = smu.measureMultiple(5, aperture=1e-3)
+    assert readings.shape == (5, 2)
+    mean, std = SMU.summarizeReadings(readings)
+    assert mean[0] == pytest.approx(2)
+    assert std[0] == pytest.approx(0)
+
+def test_instrument_pool_reuses_sessions(resource_manager):
+    smu = instrument_pool.acquire(SMU, resource_manager, "MOCK1::SMU::INSTR", "Heater SMU")
+    assert instrument_pool.acquire(SMU, resource_manager, "MOCK1::SMU::INSTR", "Heater SMU", reset=False) is smu
+    with IVTester(resource_manager) as iv_tester:
+        assert iv_tester.smu is smu
+    instrument_pool.release("MOCK1::SMU::INSTR")
+    assert instrument_pool.acquire(SMU, resource_manager, "MOCK1::SMU::INSTR", "Heater SMU") is not smu
+
 def test_ivtester_init(resource_manager):
     with IVTester(resource_manager) as iv_tester:
         iv_tester.perform_measurements()
 
+def test_ivtester_hardware_sweep(resource_manager):
+    with IVTester(resource_manager) as iv_tester:
+        iv_tester.perform_measurements(smu_voltage=[0, 1, 0.25], hardware_sweep=True)
+        with open(f"{iv_tester.result_file}.csv") as file:
+            rows = [list(map(float, row.split(","))) for row in file]
+    assert [row[0] for row in rows] == [0, 0.25, 0.5, 0.75]
+
+def test_ivtester_async(resource_manager):
+    with IVTester(resource_manager) as iv_tester:
+        results = asyncio.run(iv_tester.perform_measurements_async(smu_voltage=[0, 1, 0.25]))
+        with open(f"{iv_tester.result_file}.csv") as file:
+            rows = [list(map(float, row.split(","))) for row in file]
+    assert [row[0] for row in rows] == [0, 0.25, 0.5, 0.75]
+    assert list(results["V out"]) == [0, 0.25, 0.5, 0.75]
+
+def test_sweep_returns_typed_records(resource_manager):
+    with ThreeTTester(resource_manager) as t3t:
+        results = t3t.perform_measurements(heater_voltage=1, lia_frequency=2, lia_amplitude=3, lia_offset=[4, 6, 1])
+    assert results.dtype.names == tuple(t3t.result_columns())
+    assert all(results.dtype[name] == np.float64 for name in results.dtype.names)
+    assert list(results["lia offset"]) == [4, 5]
+    assert isinstance(LIA(resource_manager, "MOCK0::LIA::INSTR", "testLIA").getLIAMeasurment().X, float)
+
 @pytest.mark.parametrize("heater_voltage, frequency, amplitude, offset",
     [(1, 2, 3, [4,6,1]),
     (None, 2, [5,7,1], 3)])
@@ -0,0 +1,50 @@
+import pytest
+import threading
+from GMOS_LIA.MeasurementServer import MeasurementServer, MeasurementClient, Job
+
+@pytest.fixture
+def server(resource_manager):
+    server = MeasurementServer(resource_manager, ("127.0.0.1", 0), "Mock devices")
+    thread = server.start()
+    yield server
+    server.shutdown()
+    thread.join(10)
+
+def test_streams_sweep_rows(server):
+    with MeasurementClient(server.address, timeout=30) as client:
+        messages = list(client.submit("IVTester", {"smu_voltage": [0, 1, 0.25]}))
+    assert [message["status"] for message in messages if "status" in message] == ["queued", "running", "done"]
+    rows = [message["row"] for message in messages if "row" in message]
+    assert [row[0] for row in rows] == [0, 0.25, 0.5, 0.75]
+    assert messages[-1]["result file"] is not None
+
+def test_priority_order_and_cancel(server):
+    with MeasurementClient(server.address, timeout=30) as client:
+        client.queue("ThreeTTester", {"lia_offset": [4, 6, 1]})
+        low = client.queue("IVTester", {"smu_voltage": [0, 1, 0.5]}, priority=0)
+        cancelled = client.queue("IVTester", {"smu_voltage": [0, 1, 0.5]}, priority=0)
+        assert client.cancel(cancelled)
+        messages = list(client.submit("IVTester", {"smu_voltage": [0, 1, 0.5]}, priority=10))
+        assert messages[-1]["status"] == "done"
+        assert client.status(cancelled)[0]["status"] == "cancelled"
+        assert client.status(low)[0]["status"] in ("queued", "running", "done")
+
+def test_rejects_unknown_tester(server):
+    with MeasurementClient(server.address, timeout=30) as client:
+        assert list(client.submit("FourTTester"))[-1]["status"] == "error"
+
+def test_cancel_and_start_exclude_each_other():
+    for job_id in range(200):
+        job = Job(job_id, "IVTester", {}, 0)
+        start = threading.Barrier(2)
+        outcomes = []
+        def race(status):
+            start.wait()
+            outcomes.append(job.transition("queued", status))
+        threads = [threading.Thread(target=race, args=(status,)) for status in ("cancelled", "running")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(outcomes) == [False, True]
+        assert job.status in ("cancelled", "running")
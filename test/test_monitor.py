@@ -0,0 +1,36 @@
+import time
+import numpy as np
+from GMOS_LIA.Monitor import RingBuffer, TimingMonitor, ticks
+from GMOS_LIA.ResultSinks import RotatingResultSink, load_results
+
+def test_ring_buffer_keeps_newest_rows():
+    ring = RingBuffer(4, 2)
+    for i in range(10):
+        ring.append([i, -i])
+    assert len(ring) == 4
+    assert ring.count == 10
+    assert np.array_equal(ring.latest()[:, 0], [6, 7, 8, 9])
+    assert np.array_equal(ring.latest(2)[:, 0], [8, 9])
+
+def test_ticks_do_not_drift():
+    period = 5e-3
+    start = time.monotonic()
+    timing = TimingMonitor(1 / period)
+    for tick, deadline in ticks(period, start):
+        timing.record(tick, deadline)
+        if tick == 5:
+            time.sleep(3.5 * period)
+        if tick >= 40:
+            break
+    assert deadline == start + tick * period
+    assert timing.missed >= 3
+    assert timing.report().samples + timing.missed == tick + 1
+
+def test_rotation_by_size(tmp_path):
+    settings = {"format": "binary", "chunk rows": 4}
+    with RotatingResultSink(settings, str(tmp_path / "monitor"), ["t", "x"], {}, max_bytes=4 * 16) as sink:
+        for i in range(10):
+            sink.write_row([i, i])
+    assert len(sink.filenames) == 3
+    rows = [load_results(str(tmp_path / f"monitor_{part:04d}"))[0][:, 0] for part in range(3)]
+    assert np.array_equal(np.concatenate(rows), np.arange(10))
@@ -0,0 +1,34 @@
+import pytest
+from GMOS_LIA.OperatingPoint import find_operating_point
+
+def resistive_load(resistance, compliance):
+    def measure(current):
+        return min(current * resistance, compliance)
+    return measure
+
+@pytest.mark.parametrize("start", [1e-7, 1e-6, 14e-6])
+def test_finds_window(start):
+    op = find_operating_point(resistive_load(250e3, 5), start, (1e-7, 15e-6), (2, 4))
+    assert op.acquired
+    assert 2 < op.voltage < 4
+    assert op.iterations <= 6
+
+def test_falling_characteristic():
+    op = find_operating_point(lambda current: 10 - current * 1e6, 1e-6, (1e-7, 15e-6), (2, 4))
+    assert op.acquired
+    assert 2 < op.voltage < 4
+
+def test_warm_start_needs_one_measurement():
+    op = find_operating_point(resistive_load(250e3, 5), 12e-6, (1e-7, 15e-6), (2, 4))
+    assert op.acquired and op.iterations == 1
+
+def test_unreachable_window_reports_closest():
+    op = find_operating_point(resistive_load(1e3, 5), 1e-6, (1e-7, 15e-6), (2, 4), max_iterations=5)
+    assert not op.acquired
+    assert op.current == 15e-6
+    assert op.iterations <= 5
+
+def test_drain_clamped_at_compliance_is_accepted():
+    op = find_operating_point(resistive_load(250e3, 2.5), 12e-6, (1e-7, 15e-6), (2, 4), target=2.25)
+    assert op.acquired and op.iterations == 1
+    assert op.voltage == 2.5
@@ -0,0 +1,17 @@
+import time
+from GMOS_LIA.ParallelIO import ParallelIO
+
+def test_parallel_calls_overlap():
+    io = ParallelIO(3)
+    start = time.monotonic()
+    results = io.run(*(lambda i=i: time.sleep(0.1) or i for i in range(3)))
+    elapsed = time.monotonic() - start
+    io.shutdown()
+    assert results == [0, 1, 2]
+    assert elapsed < 0.25
+
+def test_disabled_runs_in_order():
+    io = ParallelIO(3, enabled=False)
+    order = []
+    io.run(*(lambda i=i: order.append(i) for i in range(3)))
+    assert order == [0, 1, 2]
@@ -0,0 +1,18 @@
+import numpy as np
+from GMOS_LIA.Records import MeasurementRecords
+
+def test_append_grows_past_capacity():
+    records = MeasurementRecords(["V out", "V meas", "I meas"], capacity=2)
+    for index in range(5):
+        records.append([index, 2 * index, 1e-3 * index])
+    assert len(records) == 5 and records.capacity == 8
+    assert records.columns == ("V out", "V meas", "I meas")
+    assert list(records.data["V meas"]) == [0, 2, 4, 6, 8]
+    assert records.as_array().shape == (5, 3)
+    assert records.data.dtype["I meas"] == np.float64
+
+def test_extend_with_previous_rows():
+    records = MeasurementRecords(["x", "y"], capacity=1)
+    records.extend(np.arange(6).reshape(3, 2))
+    records.append([6, 7])
+    assert records.as_array().ravel().tolist() == list(range(8))
@@ -0,0 +1,51 @@
+import os
+import numpy as np
+from GMOS_LIA.ResultSinks import open_result_sink
+from GMOS_LIA.ResultCatalogue import ResultCatalogue
+
+header = {
+    "tester"     : "ThreeTTester",
+    "start time" : "20240101-120000",
+    "config"     : {"sweep type": "linear"},
+    "sweep"      : {"heater voltage": np.array([2.5, 3.0]), "lia offset": np.array([0.8, 0.9, 1.0]), "sweep type": "linear"},
+    "devices"    : {"LIA": "Stanford_Research_Systems,SR860,004,1.0"}}
+
+def write_result(path, rows, result_format="csv"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open_result_sink({"format": result_format}, path, ["lia offset", "X", "R"], header) as sink:
+        for row in rows:
+            sink.write_row(row)
+
+def test_record_and_find(tmp_path):
+    path = str(tmp_path / "ThreeTTester" / "20240101-120000" / "ThreeTTester")
+    write_result(path, [[0.8, 1e-4, 2e-4], [0.9, 1e-3, 3e-3]], "binary")
+    catalogue = ResultCatalogue.in_directory(str(tmp_path))
+    catalogue.record(path, header, ["lia offset", "X", "R"], completed=True, duration=1.5)
+    assert [entry.path for entry in catalogue.find("ThreeTTester", heater_voltage=3)] == [path]
+    assert catalogue.find(heater_voltage=(3.5, None)) == []
+    assert len(catalogue.find(device="SR860", columns={"R": (2e-3, None)})) == 1
+    assert catalogue.find(columns={"R": (1e-2, None)}) == []
+    assert catalogue.find(since="20240102-000000") == []
+    description = catalogue.describe(path)
+    assert description["rows"] == 2 and description["completed"] == 1
+    assert description["ranges"]["X"] == (1e-4, 1e-3)
+    assert description["axes"]["lia offset"][2] == 3
+    data, columns = catalogue.load(catalogue.find()[0])
+    assert columns == ["lia offset", "X", "R"] and data.shape == (2, 3)
+
+def test_incremental_index(tmp_path):
+    csv_path = str(tmp_path / "IVTester" / "20240101-100000" / "IVTester")
+    binary_path = str(tmp_path / "ThreeTTester" / "20240101-120000" / "ThreeTTester")
+    write_result(csv_path, [[0, 0, 0]])
+    write_result(binary_path, [[0.8, 1e-4, 2e-4]], "binary")
+    catalogue = ResultCatalogue(str(tmp_path / "catalogue.sqlite"))
+    assert catalogue.index_tree(str(tmp_path))["added"] == 2
+    assert catalogue.index_tree(str(tmp_path))["unchanged"] == 2
+    entry, = catalogue.find("IVTester")
+    assert entry.start_time == "20240101-100000" and entry.columns == ["column 0", "column 1", "column 2"]
+    write_result(csv_path, [[0, 0, 0], [1, 1, 1e-3]])
+    os.utime(f"{csv_path}.csv", (1e9, 1e9))
+    os.remove(f"{binary_path}.f64")
+    counts = catalogue.index_tree(str(tmp_path))
+    assert counts["updated"] == 1 and counts["removed"] == 1
+    assert [entry.rows for entry in catalogue.find()] == [2]
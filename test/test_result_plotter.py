@@ -0,0 +1,47 @@
+import os
+import time
+import numpy as np
+from GMOS_LIA.ResultPlotter import Plotter, LivePlotter, downsample_minmax
+from GMOS_LIA.ResultSinks import open_result_sink
+
+PLOT_SETTINGS = {
+    "X column index" : 0,
+    "Y column index" : 1,
+    "X label"        : "x",
+    "Y label"        : "y",
+    "X scale"        : "linear",
+    "Y scale"        : "linear",
+    "Plot title"     : "test",
+    "Max points"     : 100,
+}
+
+def test_downsample_keeps_envelope():
+    X = np.arange(100000, dtype=float)
+    Y = np.sin(X / 1000)
+    Y[12345] = 10
+    Y[54321] = -10
+    x, y = downsample_minmax(X, Y, 200)
+    assert len(x) <= 200
+    assert y.max() == 10 and y.min() == -10
+    assert np.all(np.diff(x) > 0)
+
+def test_replot_skips_unchanged(tmp_path):
+    for name in ("a", "b"):
+        with open_result_sink({"format": "binary"}, str(tmp_path / name), ["x", "y"], {}) as sink:
+            for x in range(10):
+                sink.write_row([x, x ** 2])
+    assert len(Plotter.replot_tree(str(tmp_path), PLOT_SETTINGS, max_workers=2)) == 2
+    assert os.path.exists(tmp_path / "a.png")
+    assert Plotter.replot_tree(str(tmp_path), PLOT_SETTINGS) == []
+    time.sleep(0.01)
+    os.utime(tmp_path / "b.f64")
+    assert Plotter.replot_tree(str(tmp_path), PLOT_SETTINGS) == [str(tmp_path / "b.png")]
+
+def test_live_plotter_never_blocks(tmp_path):
+    live = LivePlotter(str(tmp_path / "live"), PLOT_SETTINGS, max_batches=2)
+    start = time.monotonic()
+    for x in range(5000):
+        live.push([x, x ** 0.5])
+    assert time.monotonic() - start < 1
+    live.close()
+    assert os.path.exists(tmp_path / "live_live.png")
@@ -0,0 +1,35 @@
+import json
+import numpy as np
+import pytest
+from GMOS_LIA.ResultSinks import open_result_sink, load_results
+
+COLUMNS = ["x", "y", "z"]
+ROWS = [[0.1, 1 / 3, 2e-9], [0.2, 2 / 3, 4e-9], [0.3, 1.0, 6e-9]]
+
+@pytest.mark.parametrize("result_format", ["csv", "binary"])
+def test_round_trip(tmp_path, result_format):
+    path = str(tmp_path / "result")
+    settings = {"format": result_format, "chunk rows": 2}
+    with open_result_sink(settings, path, COLUMNS, {"devices": {"SMU": "MockSMU"}}) as sink:
+        for row in ROWS:
+            sink.write_row(row)
+    data, columns = load_results(path)
+    assert np.array_equal(data, np.array(ROWS))
+    if result_format == "binary":
+        assert columns == COLUMNS
+        assert isinstance(data, np.memmap)
+        with open(f"{path}.json") as file:
+            assert json.load(file)["devices"] == {"SMU": "MockSMU"}
+
+def test_binary_flushes_full_chunks(tmp_path):
+    path = str(tmp_path / "result")
+    sink = open_result_sink({"format": "binary", "chunk rows": 2, "flush interval": 1e3}, path, COLUMNS, {})
+    assert [sink.write_row(row) for row in ROWS] == [False, True, False]
+    assert len(load_results(path)[0]) == 2
+    sink.close()
+    assert len(load_results(path)[0]) == 3
+
+def test_binary_rejects_wrong_row_length(tmp_path):
+    with open_result_sink({"format": "binary"}, str(tmp_path / "result"), COLUMNS, {}) as sink:
+        with pytest.raises(ValueError):
+            sink.write_row([1, 2])
@@ -0,0 +1,74 @@
+import time
+import asyncio
+import pytest
+from functools import partial
+from GMOS_LIA.Settling import Settler
+from GMOS_LIA.LabDevices import instrument_pool
+from GMOS_LIA.LIASetup import ThreeTTester, load_setup_config
+from GMOS_LIA.Simulation import SimulatedResourceManager
+
+def exponential_reading(tau):
+    start = time.monotonic()
+    def read():
+        return [1 - 2.718281828 ** (-(time.monotonic() - start) / tau), 0.0]
+    return read
+
+@pytest.mark.parametrize("criterion", ["relative", "slope"])
+def test_settles_before_timeout(criterion):
+    settler = Settler({"criterion": criterion, "tolerance": 1e-2, "poll interval": 1e-3})
+    reading, settle_time = settler.settle(exponential_reading(10e-3), timeout=2)
+    assert settle_time < 1
+    assert reading[0] == pytest.approx(1, abs=5e-2)
+
+@pytest.mark.parametrize("criterion", ["relative", "slope"])
+def test_slow_drift_is_not_settled_early(criterion):
+    settler = Settler({"criterion": criterion, "tolerance": 1e-2, "poll interval": 5e-3, "window": 0.1})
+    reading, settle_time = settler.settle(exponential_reading(0.2), timeout=5)
+    assert settle_time > 0.5
+    assert reading[0] == pytest.approx(1, abs=3e-2)
+
+def test_async_settle_interleaves():
+    settler = Settler({"criterion": "relative", "tolerance": 1e-2, "poll interval": 1e-3})
+    async def settle_both():
+        reads = [exponential_reading(20e-3), exponential_reading(20e-3)]
+        async def read(index):
+            return reads[index]()
+        return await asyncio.gather(*(settler.asettle(partial(read, index), timeout=2) for index in range(2)))
+    start = time.monotonic()
+    results = asyncio.run(settle_both())
+    elapsed = time.monotonic() - start
+    assert all(reading[0] > 0.5 for reading, _ in results)
+    assert elapsed < sum(settle_time for _, settle_time in results)
+
+def test_timeout_caps_settling():
+    settler = Settler({"criterion": "relative", "tolerance": 1e-6, "poll interval": 1e-3})
+    _, settle_time = settler.settle(exponential_reading(10), timeout=50e-3)
+    assert settle_time == pytest.approx(50e-3, abs=20e-3)
+
+def test_time_constants_wait():
+    settler = Settler({"criterion": "time constants", "time constants": 5})
+    _, settle_time = settler.settle(lambda: [1.0], timeout=1, time_constant=2e-3)
+    assert settle_time < 0.5
+
+def test_invalid_criterion():
+    with pytest.raises(Exception):
+        Settler({"criterion": "never"})
+
+def test_heater_settles_on_the_biased_drain(tmp_path):
+    res_man = SimulatedResourceManager.from_setup(load_setup_config("setup.json"),
+                                                  settings={"latency": 0, "heater time constant": 0.1})
+    instrument_pool.release()
+    with ThreeTTester(res_man, results_root=str(tmp_path)) as t3t:
+        t3t._heater_settler = Settler({"criterion": "slope", "tolerance": 1e-2, "absolute tolerance": 1e-9,
+                                       "poll interval": 10e-3, "window": 0.2})
+        t3t._heater_sleep = 3
+        t3t.drain.setOn()
+        t3t.heater.setOn()
+        t3t.heater.setVoltage(1)
+        _, settle_time = t3t.settle_heater(1)
+        model = res_man.model
+        model.advance()
+        rise = model._thermal_resistance * model.heater_power
+        assert settle_time > 0.3
+        assert model.temperature - model.ambient == pytest.approx(rise, rel=2e-2)
+    instrument_pool.release()
@@ -0,0 +1,54 @@
+import time
+import numpy as np
+from GMOS_LIA.LabDevices import SMU, LIA
+from GMOS_LIA.Simulation import SimulatedResourceManager
+from GMOS_LIA.Benchmark import compare_reports
+
+devices = {"SIM::DRAIN": "drain SMU", "SIM::HEATER": "heater SMU", "SIM::LIA": "LIA"}
+
+def test_instruments_follow_the_sensor_model():
+    res_man = SimulatedResourceManager(devices, {"latency": 0, "heater time constant": 10e-3}, seed=1)
+    heater = SMU(res_man, "SIM::HEATER", "Heater SMU")
+    drain = SMU(res_man, "SIM::DRAIN", "Drain SMU")
+    heater.setFunctionVoltageFixed()
+    heater.setCurrentCompliance(0.1)
+    heater.setVoltage(3)
+    heater.setOn()
+    time.sleep(0.1)
+    V, I = heater.getMeasurement()
+    assert abs(V - 3) < 0.01 and 0.02 < I < 0.03
+    drain.setFunctionCurrentFixed()
+    drain.setVoltageCompliance(2.5)
+    drain.setCurrent(1e-3)
+    drain.setOn()
+    assert abs(drain.getMeasurement()[0] - 2.5) < 0.01
+    assert drain.inVoltageCompliance()
+    drain.setDataFormat(binary=True)
+    readings = drain.measureMultiple(5)
+    assert readings.shape == (5, 2)
+
+def test_lia_settles_with_its_time_constant():
+    res_man = SimulatedResourceManager(devices, {"latency": 0, "noise": 0, "lia noise": 0})
+    lia = LIA(res_man, "SIM::LIA", "LIA")
+    lia.write("OFLT 4")
+    assert lia.getTimeConstant() == 1e-4
+    lia.setOutputAmplitude(0.05)
+    lia.setOutputOffset(0.95)
+    time.sleep(0.01)
+    assert abs(float(lia.getLIAMeasurment().R) - 0.05) < 1e-4
+
+def test_counts_bus_transactions():
+    res_man = SimulatedResourceManager(devices, {"latency": 5e-3})
+    smu = res_man.open_resource("SIM::DRAIN")
+    start = time.monotonic()
+    smu.write(":SOUR:CURR 1e-6;:OUTP 1")
+    smu.query(":MEAS?")
+    assert time.monotonic() - start >= 10e-3
+    assert res_man.transactions == 2
+    assert res_man.bytes > 0
+
+def test_compare_reports_flags_regressions():
+    baseline = {"results": [{"tester": "IVTester", "points": 10, "points per second": 100, "transactions per point": 3}]}
+    report = {"results": [{"tester": "IVTester", "points": 10, "points per second": 70, "transactions per point": 3}]}
+    assert len(compare_reports(report, baseline, 0.2)) == 1
+    assert compare_reports(baseline, baseline, 0.2) == []
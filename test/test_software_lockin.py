@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from GMOS_LIA.LabDevices import SMU, instrument_pool
+from GMOS_LIA.LIASetup import ThreeTTester, load_setup_config
+from GMOS_LIA.Simulation import SimulatedResourceManager
+from GMOS_LIA.SoftwareLockIn import SoftwareLockIn, coherent_frequencies, multitone, schroeder_phases, demodulate
+
+sample_rate = 10e3
+n_samples = 10000
+
+def test_demodulates_all_tones_of_a_synthetic_signal():
+    frequencies = coherent_frequencies([50, 120, 333, 1000], sample_rate, n_samples)
+    amplitudes = np.array([1.0, 0.5, 0.2, 0.05])
+    phases = np.radians([0, 30, -60, 90])
+    signal = multitone(frequencies, amplitudes, sample_rate, n_samples, phases, offset=2.5)
+    signal += np.random.default_rng(0).normal(0, 1e-3, n_samples)
+    meas = demodulate(signal, frequencies, sample_rate)
+    assert np.allclose(meas.R, amplitudes / np.sqrt(2), atol=1e-4)
+    assert np.allclose(meas.theta, np.degrees(phases), atol=0.1)
+    assert np.allclose(meas.X, meas.R * np.cos(np.radians(meas.theta)))
+    relative = demodulate(signal, frequencies, sample_rate, reference=phases)
+    assert np.allclose(relative.theta, 0, atol=0.1)
+
+def test_off_bin_tone_with_hann_window():
+    t = np.arange(n_samples) / sample_rate
+    meas = demodulate(np.sin(2 * np.pi * 100.3 * t), [100.3], sample_rate)
+    assert abs(meas.R[0] - 1 / np.sqrt(2)) < 0.01
+
+def test_coherent_frequencies():
+    assert np.allclose(coherent_frequencies([10.2, 20.7], sample_rate, n_samples), [10, 21])
+    with pytest.raises(Exception):
+        coherent_frequencies([10, 11], sample_rate, n_samples)
+    with pytest.raises(Exception):
+        coherent_frequencies([6e3], sample_rate, n_samples)
+
+def test_schroeder_phases_lower_the_crest_factor():
+    frequencies = np.arange(1, 21) * 10.0
+    flat = multitone(frequencies, 1, sample_rate, n_samples, np.zeros(20))
+    schroeder = multitone(frequencies, 1, sample_rate, n_samples, schroeder_phases(20))
+    assert np.abs(schroeder).max() < 0.5 * np.abs(flat).max()
+
+def test_one_capture_measures_a_resistive_drain():
+    res_man = SimulatedResourceManager({"SIM::DRAIN": "drain SMU"}, {"latency": 0, "noise": 0})
+    drain = SMU(res_man, "SIM::DRAIN", "Drain SMU")
+    drain.setVoltageCompliance(20)
+    drain.setOn()
+    frequencies, meas = SoftwareLockIn(drain, 1e3, 500).measure([10, 50, 100], 1e-6, 10e-6)
+    assert np.allclose(frequencies, [10, 50, 100])
+    assert np.allclose(meas.R, 1e-6 * 400e3 / np.sqrt(2), rtol=1e-3)
+    assert np.allclose(meas.theta, 0, atol=0.1)
+
+def test_steps_are_paced_by_the_trigger_timer():
+    res_man = SimulatedResourceManager({"SIM::DRAIN": "drain SMU"}, {"latency": 0, "noise": 0})
+    drain = SMU(res_man, "SIM::DRAIN", "Drain SMU")
+    drain.setVoltageCompliance(20)
+    drain.setOn()
+    SoftwareLockIn(drain, 2e3, 200, aperture=100e-6).measure([100], 1e-6, 10e-6)
+    settings = drain.inst.instrument.settings
+    assert (settings["TRIG:SOUR"], float(settings["TRIG:TIM"])) == ("TIM", 0.5e-3)
+    drain.getMeasurement()
+    assert (settings["TRIG:SOUR"], settings["TRIG:COUN"]) == ("AINT", "1")
+    with pytest.raises(Exception):
+        SoftwareLockIn(drain, 2e3, 200, aperture=1e-3)
+
+def test_frequency_response_with_the_default_config(tmp_path):
+    res_man = SimulatedResourceManager.from_setup(load_setup_config("setup.json"),
+                                                  settings={"latency": 0, "heater time constant": 10e-3})
+    instrument_pool.release()
+    with ThreeTTester(res_man, results_root=str(tmp_path)) as t3t:
+        t3t._sleep_time = 5e-3
+        t3t._heater_sleep = 0.2
+        frequencies, meas = t3t.measure_frequency_response()
+    instrument_pool.release()
+    assert np.allclose(frequencies, [t3t._lia_frequency])
+    assert np.all(meas.R > 0)
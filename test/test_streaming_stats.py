@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from GMOS_LIA.StreamingStats import RunningStats, Averager
+
+def noisy_reading(mean, sigma, seed=0):
+    rng = np.random.default_rng(seed)
+    return lambda: [mean + sigma * rng.standard_normal(), 2 * mean]
+
+def test_running_stats_matches_numpy():
+    samples = np.random.default_rng(1).normal(size=(200, 3))
+    stats = RunningStats()
+    for sample in samples:
+        stats.push(sample)
+    assert stats.n == 200
+    assert np.allclose(stats.mean, samples.mean(axis=0))
+    assert np.allclose(stats.variance, samples.var(axis=0, ddof=1))
+    assert np.allclose(stats.sem, samples.std(axis=0, ddof=1) / np.sqrt(200))
+
+def test_stops_at_target_sem():
+    averager = Averager({"max samples": 10000, "relative sem": 1e-3})
+    stats = averager.average(noisy_reading(1.0, 0.01))
+    assert stats.n < 10000
+    assert np.all(stats.sem <= averager.target(stats.mean))
+    assert stats.mean[0] == pytest.approx(1.0, abs=5e-3)
+
+def test_stops_at_max_samples():
+    stats = Averager({"max samples": 20, "relative sem": 0}).average(noisy_reading(1.0, 0.1))
+    assert stats.n == 20
+
+def test_rejects_outliers():
+    rng = np.random.default_rng(2)
+    values = iter([[1 + 1e-3 * rng.standard_normal()] for _ in range(5)] + [[100.0]] +
+                  [[1 + 1e-3 * rng.standard_normal()] for _ in range(14)])
+    averager = Averager({"max samples": 20, "relative sem": 0, "outlier threshold": 4, "min samples": 5})
+    stats = averager.average(lambda: next(values))
+    assert stats.rejected == 1
+    assert stats.n == 19
+    assert stats.mean[0] == pytest.approx(1, abs=1e-2)
+
+def test_disabled_by_default():
+    assert not Averager({}).enabled
@@ -0,0 +1,29 @@
+import numpy as np
+from itertools import product
+from GMOS_LIA.SweepPlan import SweepPlan
+
+AXES = {"heater_voltage": [1, 2], "lia_frequency": [10, 20, 30], "lia_offset": [0.1, 0.2, 0.3, 0.4]}
+COSTS = {"heater_voltage": 10, "lia_frequency": 2, "lia_offset": 1}
+
+def test_plan_covers_every_point_once():
+    plan = SweepPlan(AXES, COSTS)
+    assert sorted(plan.points["index"]) == list(range(24))
+    original = list(product(*AXES.values()))
+    for point in plan:
+        assert tuple(point[name] for name in AXES) == original[point["index"]]
+
+def test_serpentine_changes_one_axis_per_step():
+    plan = SweepPlan(AXES, COSTS)
+    changes = sum((plan.points[name][1:] != plan.points[name][:-1]).astype(int) for name in AXES)
+    assert np.all(changes == 1)
+    assert np.count_nonzero(np.diff(plan.points["heater_voltage"])) == 1
+    assert np.count_nonzero(np.diff(plan.points["lia_frequency"])) == 4
+
+def test_costliest_axis_is_outermost():
+    plan = SweepPlan({"lia_offset": [1, 2], "heater_voltage": [1, 2]}, COSTS)
+    assert plan.axes == ["heater_voltage", "lia_offset"]
+    assert list(plan.points["heater_voltage"]) == [1, 1, 2, 2]
+
+def test_predicted_duration():
+    plan = SweepPlan(AXES, COSTS, point_cost=0.5)
+    assert plan.predicted_duration() == 10 + 10 + 4 * 2 + 18 * 1 + 24 * 0.5
@@ -0,0 +1,77 @@
+import json
+import pytest
+from GMOS_LIA.LabDevices import SMU, instrument_pool
+from GMOS_LIA.LIASetup import IVTester, load_setup_config
+from GMOS_LIA.Simulation import SimulatedResourceManager
+from GMOS_LIA.Tracing import Tracer, tracer, command_key, format_summary
+
+@pytest.fixture
+def smu():
+    res_man = SimulatedResourceManager({"SIM::SMU": "drain SMU"}, {"latency": 1e-3})
+    yield SMU(res_man, "SIM::SMU", "Drain SMU")
+    tracer.disable()
+    tracer.clear()
+
+def test_command_key():
+    assert command_key(":SOUR:VOLT 1;:OUTP 1") == "SOUR:VOLT;OUTP"
+    assert command_key("MEAS?") == "MEAS?"
+
+def test_disabled_tracer_records_nothing(smu):
+    smu.getMeasurement()
+    assert tracer.events() == []
+
+def test_summary_and_chrome_trace(smu, tmp_path):
+    tracer.enable()
+    start = tracer.now()
+    with tracer.span("sweep"):
+        for current in (1e-6, 2e-6, 3e-6):
+            smu.setCurrent(current)
+            smu.getMeasurement()
+            tracer.mark("point")
+    summary = tracer.summary(start)
+    assert summary["points"] == 3
+    assert summary["transactions"] == 6
+    assert summary["instruments"]["Drain SMU"]["transactions"] == 6
+    meas = summary["commands"]["Drain SMU MEAS?"]
+    assert meas["count"] == 3 and meas["per point"] == 1
+    assert meas["mean"] >= 1e-3
+    assert "MEAS?" in format_summary(summary)
+    assert sum(tracer.histograms(start=start)["commands"]["Drain SMU SOUR:CURR"]) == 3
+    filename = str(tmp_path / "sweep.trace.json")
+    tracer.export_chrome_trace(filename, start)
+    with open(filename) as file:
+        events = json.load(file)["traceEvents"]
+    assert [event["ph"] for event in events].count("X") == 7
+    assert any(event["name"] == "sweep" for event in events)
+
+def test_capacity_bounds_the_buffer():
+    bounded = Tracer(capacity=2)
+    bounded.enable()
+    for _ in range(5):
+        bounded.mark("point")
+    assert len(bounded.events()) == 2
+
+def test_tracing_restores_previous_state():
+    scoped = Tracer()
+    with scoped.tracing(True):
+        assert scoped.enabled
+    assert not scoped.enabled
+    scoped.enable()
+    with scoped.tracing(False):
+        assert scoped.enabled
+    assert scoped.enabled
+
+def test_traced_setup_leaves_later_setups_untraced(tmp_path):
+    res_man = SimulatedResourceManager.from_setup(load_setup_config("setup.json"), settings={"latency": 0})
+    instrument_pool.release()
+    summaries = []
+    for enabled in (True, False):
+        with IVTester(res_man, results_root=str(tmp_path)) as iv_tester:
+            iv_tester._sleep_time = 1e-3
+            iv_tester._trace_settings = {"enabled": enabled, "export": False}
+            iv_tester.perform_measurements(smu_voltage=[0, 1, 0.5])
+            summaries.append(iv_tester.trace_summary)
+        assert not tracer.enabled
+    instrument_pool.release()
+    tracer.clear()
+    assert summaries[0]["points"] == 2 and summaries[1] is None